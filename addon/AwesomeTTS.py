@@ -120,6 +120,7 @@ awesometts.cards_button()      # on-the-fly templater helper in card view
 awesometts.config_menu()       # provides access to configuration dialog
 awesometts.editor_button()     # single audio clip generator button
 awesometts.reviewer_hooks()    # on-the-fly playback/shortcuts, context menus
+# awesometts.sanitizer_timings()  # log per-rule text timings at exit
 awesometts.sound_tag_delays()  # delayed playing of stored [sound]s in review
 awesometts.temp_files()        # remove temporary files upon session exit
 awesometts.update_checker()    # if enabled, runs the add-on update checker
@@ -24,6 +24,7 @@
 Add-on package initialization
 """
 
+from os import getpid
 from os.path import join
 import sys
 from time import time
@@ -35,16 +36,20 @@ import anki
 import aqt
 
 from . import conversion as to, gui, paths, service
+from .audio import Durations
 from .bundle import Bundle
 from .config import Config
+from .network import Network
 from .player import Player
 from .router import Router
+from .scratch import Scratch
 from .text import Sanitizer
+from .transcoder import Transcoder
 from .updates import Updates
 
 __all__ = ['browser_menus', 'cards_button', 'config_menu', 'editor_button',
-           'reviewer_hooks', 'sound_tag_delays', 'update_checker',
-           'window_shortcuts']
+           'reviewer_hooks', 'sanitizer_timings', 'sound_tag_delays',
+           'update_checker', 'window_shortcuts']
 
 
 def get_platform_info():
@@ -106,12 +111,12 @@ config = Config(
         ('automaticQuestions', 'integer', True, to.lax_bool, int),
         ('automatic_questions_errors', 'integer', True, to.lax_bool, int),
         ('cache_days', 'integer', 70, int, int),
-        ('delay_answers_onthefly', 'integer', 0, int, int),
-        ('delay_answers_stored_ours', 'integer', 0, int, int),
-        ('delay_answers_stored_theirs', 'integer', 0, int, int),
-        ('delay_questions_onthefly', 'integer', 0, int, int),
-        ('delay_questions_stored_ours', 'integer', 0, int, int),
-        ('delay_questions_stored_theirs', 'integer', 0, int, int),
+        ('delay_answers_onthefly', 'real', 0.0, float, float),
+        ('delay_answers_stored_ours', 'real', 0.0, float, float),
+        ('delay_answers_stored_theirs', 'real', 0.0, float, float),
+        ('delay_questions_onthefly', 'real', 0.0, float, float),
+        ('delay_questions_stored_ours', 'real', 0.0, float, float),
+        ('delay_questions_stored_theirs', 'real', 0.0, float, float),
         ('ellip_note_newlines', 'integer', False, to.lax_bool, int),
         ('ellip_template_newlines', 'integer', False, to.lax_bool, int),
         ('extras', 'text', {}, to.deserialized_dict, to.compact_json),
@@ -167,6 +172,7 @@ config = Config(
         ('templater_target', 'text', 'front', str, str),
         ('throttle_sleep', 'integer', 30, int, int),
         ('throttle_threshold', 'integer', 10, int, int),
+        ('trim_silence', 'integer', False, to.lax_bool, int),
         ('TTS_KEY_A', 'integer', Qt.Key_F4, to.nullable_key, to.nullable_int),
         ('TTS_KEY_Q', 'integer', Qt.Key_F3, to.nullable_key, to.nullable_int),
         ('updates_enabled', 'integer', True, to.lax_bool, int),
@@ -176,8 +182,17 @@ config = Config(
     logger=logger,
     events=[
     ],
+    keyed=['extras', 'groups', 'last_options', 'presets'],
 )
 
+network = Network(logger=logger)
+
+durations = Durations(path=paths.DURATIONS, logger=logger)
+
+scratch = Scratch(disk_base=paths.TEMP, logger=logger)
+
+transcoder = Transcoder(logger=logger)
+
 player = Player(
     anki=Bundle(
         mw=aqt.mw,
@@ -186,6 +201,8 @@ player = Player(
     ),
     blank=paths.BLANK,
     config=config,
+    durations=durations,
+    silence=paths.SILENCE,
     logger=logger,
 )
 
@@ -235,16 +252,24 @@ router = Router(
                  ('windowsjscript', 'sapi5js'), ('y', 'yandex')],
         normalize=to.normalized_ascii,
         args=(),
-        kwargs=dict(temp_dir=paths.TEMP,
+        kwargs=dict(scratch=scratch,
                     lame_flags=lambda: config['lame_flags'],
                     normalize=to.normalized_ascii,
                     logger=logger,
-                    ecosystem=Bundle(web=WEB, agent=AGENT)),
+                    ecosystem=Bundle(web=WEB, agent=AGENT),
+                    network=network,
+                    responses_dir=paths.RESPONSES,
+                    transcoder=transcoder,
+                    trim_silence=lambda: config['trim_silence']),
     ),
     cache_dir=paths.CACHE,
-    temp_dir=join(paths.TEMP, '_awesometts_scratch_' + str(int(time()))),
+    # n.b. named like the Scratch dirs, w/ PID, so scratch.sweep() gets it
+    temp_dir=join(paths.TEMP,
+                  '_awesometts_scratch_%d_%d' % (int(time()), getpid())),
     logger=logger,
     config=config,
+    durations=durations,
+    network=network,
 )
 
 updates = Updates(
@@ -284,11 +309,14 @@ addon = Bundle(
         ),
         fail=lambda message: aqt.utils.showCritical(message, aqt.mw),
     ),
+    durations=durations,
     logger=logger,
     paths=Bundle(cache=paths.CACHE,
                  is_link=paths.ADDON_IS_LINKED),
     player=player,
     router=router,
+    scratch=scratch,
+    transcoder=transcoder,
     strip=Bundle(
         # n.b. cloze substitution logic happens first in both modes because:
         # - we need the <span>...</span> markup in on-the-fly to identify it
@@ -498,7 +526,34 @@ def cache_control():
             except:  # skip broken files, pylint:disable=bare-except
                 pass
 
+    def on_unload_profile_responses():
+        """
+        Removes expired intermediate web responses. Each file's
+        modification time is set to when it expires when it is stored.
+        """
+
+        from os import listdir, unlink
+        from os.path import getmtime
+
+        responses = paths.RESPONSES
+        now = time()
+
+        try:
+            filenames = listdir(responses)
+        except:  # allow silent failure, pylint:disable=bare-except
+            return
+
+        for filename in filenames:
+            target = join(responses, filename)
+            try:
+                if getmtime(target) < now:
+                    unlink(target)
+            except:  # skip broken files, pylint:disable=bare-except
+                pass
+
     anki.hooks.addHook('unloadProfile', on_unload_profile)
+    anki.hooks.addHook('unloadProfile', on_unload_profile_responses)
+    anki.hooks.addHook('unloadProfile', durations.save)  # after removals
 
 
 def cards_button():
@@ -538,7 +593,8 @@ def cards_button():
 def config_menu():
     """
     Adds a menu item to the Tools menu in Anki's main window for
-    launching the configuration dialog.
+    launching the configuration dialog, and writes out any pending
+    configuration changes when the profile is closed.
     """
 
     gui.Action(
@@ -555,6 +611,10 @@ def config_menu():
         parent=aqt.mw.form.menuTools,
     )
 
+    # n.b. config writes wait on the main window's event loop, which may
+    # not get another chance to run them once the profile is unloaded
+    anki.hooks.addHook('unloadProfile', config.flush)
+
 
 def editor_button():
     """
@@ -624,6 +684,11 @@ def reviewer_hooks():
         lambda: reviewer.card_handler('answer', aqt.mw.reviewer.card),
     )
 
+    # prefetching of on-the-fly clips for the answer and upcoming cards
+
+    anki.hooks.addHook('showQuestion', reviewer.prefetch_handler)
+    anki.hooks.addHook('reviewCleanup', reviewer.prefetch_cancel)
+
     # shortcut-triggered playback
 
     reviewer_filter = gui.Filter(
@@ -770,6 +835,36 @@ def reviewer_hooks():
                        on_context_menu(reviewer.web, menu))
 
 
+def sanitizer_timings():
+    """
+    Switches on per-rule timing for every Sanitizer in addon.strip and
+    logs a report for each of them upon session exit.
+    """
+
+    def find(bundle, prefix):
+        """Yields (name, sanitizer) for the bundle, recursively."""
+
+        for key, value in sorted(vars(bundle).items()):
+            if isinstance(value, Bundle):
+                for found in find(value, prefix + key + '.'):
+                    yield found
+            elif isinstance(value, Sanitizer):
+                yield prefix + key, value
+
+    sanitizers = list(find(addon.strip, 'strip.'))
+
+    for _, sanitizer in sanitizers:
+        sanitizer.profile()
+
+    def on_unload_profile():
+        """Logs the report of each Sanitizer."""
+
+        for name, sanitizer in sanitizers:
+            logger.info(sanitizer.report(name))
+
+    anki.hooks.addHook('unloadProfile', on_unload_profile)
+
+
 def sound_tag_delays():
     """
     Enables support for the following sound delay configuration options:
@@ -786,38 +881,7 @@ def sound_tag_delays():
 def temp_files():
     """Remove temporary files upon session exit."""
 
-    def on_unload_profile():
-        """
-        Finds scratch directories in the temporary path, removes their
-        files, then removes the directories themselves.
-        """
-
-        from os import listdir, unlink, rmdir
-        from os.path import isdir
-
-        temp = paths.TEMP
-
-        try:
-            subdirs = [join(temp, filename) for filename in listdir(temp)
-                       if filename.startswith('_awesometts_scratch')]
-        except:  # allow silent failure, pylint:disable=bare-except
-            return
-        if not subdirs:
-            return
-
-        for subdir in subdirs:
-            if isdir(subdir):
-                for filename in listdir(subdir):
-                    try:
-                        unlink(join(subdir, filename))
-                    except:  # skip busy files, pylint:disable=bare-except
-                        pass
-                try:
-                    rmdir(subdir)
-                except:  # allow silent failure, pylint:disable=bare-except
-                    pass
-
-    anki.hooks.addHook('unloadProfile', on_unload_profile)
+    anki.hooks.addHook('unloadProfile', scratch.sweep)
 
 
 def update_checker():
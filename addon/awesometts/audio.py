@@ -0,0 +1,710 @@
+# -*- coding: utf-8 -*-
+
+# AwesomeTTS text-to-speech add-on for Anki
+#
+# Copyright (C) 2016       Anki AwesomeTTS Development Team
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Pure-Python inspection and manipulation of MP3 streams
+"""
+
+import audioop
+from collections import deque
+import json
+import os
+from threading import Lock
+
+from .bundle import Bundle
+
+__all__ = ['Durations', 'Frames', 'SilenceTrimmer', 'is_info_frame',
+           'join_mp3s', 'parse_header', 'parse_wav_header', 'scan_mp3',
+           'silent_mp3', 'sized_wav_header', 'trim_wav', 'validate_mp3',
+           'validate_wav']
+
+
+CHUNK_SIZE = 2 ** 16
+
+# kilobits per second, indexed by [is MPEG-1][layer][bitrate index]
+BITRATES = {
+    True: {
+        1: (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416,
+            448),
+        2: (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320,
+            384),
+        3: (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256,
+            320),
+    },
+    False: {
+        1: (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224,
+            256),
+        2: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+        3: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    },
+}
+
+# hertz, indexed by [version bits][sample rate index]
+SAMPLE_RATES = {
+    0: (11025, 12000, 8000),   # MPEG-2.5
+    2: (22050, 24000, 16000),  # MPEG-2
+    3: (44100, 48000, 32000),  # MPEG-1
+}
+
+# header for silent_mp3() frames: MPEG-1 Layer III, 32 kbps, 48 kHz, mono,
+# no CRC (i.e. 96-byte frames, each 24 ms long)
+SILENT_HEADER = '\xff\xfb\x14\xc0'
+
+# seconds of silence that join_mp3s() ends its output with
+TRAILING_SILENCE = 0.1
+
+ID3V1_SIZE = 128
+ID3V2_HEADER_SIZE = 10
+
+# any clip with less decoded audio than this is not worth keeping
+MIN_DURATION = 0.1
+
+# when trimming, audio quieter than this (relative to full scale) is silent
+TRIM_THRESHOLD_DB = -45
+
+# when trimming, this many seconds of silence is kept at each edge
+TRIM_MARGIN = 0.1
+
+# when trimming, silence is detected in windows of this many seconds
+TRIM_WINDOW = 0.01
+
+
+def parse_header(header):
+    """
+    Given a four-byte string, returns a bundle describing the MPEG audio
+    frame header it contains, or None if it is not a valid header. The
+    bundle has the MPEG version (1, 2, or 2.5), layer (1, 2, or 3),
+    bitrate (in kbps), sample_rate (in Hz), mono flag, samples (per
+    frame), and length (of the whole frame in bytes, header included).
+
+    Free-format streams (i.e. no bitrate index) are treated as invalid,
+    as their frame lengths cannot be known from the header alone.
+    """
+
+    if len(header) < 4:
+        return None
+
+    byte0, byte1, byte2, byte3 = [ord(char) for char in header[:4]]
+
+    if byte0 != 0xFF or byte1 & 0xE0 != 0xE0:
+        return None
+
+    version_bits = (byte1 >> 3) & 3
+    layer = 4 - ((byte1 >> 1) & 3)
+    bitrate_index = byte2 >> 4
+    sample_rate_index = (byte2 >> 2) & 3
+
+    if version_bits == 1 or layer == 4 or bitrate_index in (0, 15) or \
+            sample_rate_index == 3:
+        return None
+
+    is_mpeg1 = version_bits == 3
+    bitrate = BITRATES[is_mpeg1][layer][bitrate_index]
+    sample_rate = SAMPLE_RATES[version_bits][sample_rate_index]
+    samples = (384 if layer == 1
+               else 1152 if layer == 2 or is_mpeg1
+               else 576)
+    slot_size = 4 if layer == 1 else 1
+    padding = (byte2 >> 1) & 1
+
+    return Bundle(
+        version=1 if is_mpeg1 else 2 if version_bits == 2 else 2.5,
+        layer=layer,
+        bitrate=bitrate,
+        sample_rate=sample_rate,
+        mono=byte3 >> 6 == 3,
+        samples=samples,
+        length=(samples // 8 * bitrate * 1000 // sample_rate // slot_size +
+                padding) * slot_size,
+    )
+
+
+def is_info_frame(header, frame):
+    """
+    Returns True if the given frame (with its parsed header) carries a
+    Xing, Info (i.e. LAME), or VBRI metadata tag instead of audio.
+    """
+
+    if header.layer != 3:
+        return False
+
+    side_info_size = (
+        (17 if header.mono else 32) if header.version == 1
+        else (9 if header.mono else 17)
+    )
+    return (frame[4 + side_info_size:8 + side_info_size] in ('Xing', 'Info')
+            or frame[36:40] == 'VBRI')
+
+
+class Frames(object):
+    """
+    Iterates over the MPEG audio frames in a file-like stream, yielding
+    (header, frame) tuples, where header is a bundle from parse_header()
+    and frame is the string of the whole frame, header included.
+
+    The stream is read in chunks, so whole files are never held in
+    memory. ID3v1 and ID3v2 tags are skipped. Anything else that is not
+    a frame is skipped one byte at a time; null bytes (e.g. padding) are
+    skipped without being counted as junk. Whenever the scanner is not
+    already in sync (i.e. at the start or after junk), a frame header is
+    only believed if another header, a tag, null padding, or the end of
+    the stream follows the frame it describes.
+
+    After iterating, the instance's attributes tell how clean the
+    stream was: junk is the number of bytes that were skipped outside
+    of tags, and truncated is True if the stream ended partway through
+    a frame (which is then not yielded).
+    """
+
+    __slots__ = [
+        '_buffer',    # string of bytes read from the stream but unconsumed
+        '_offset',    # position in _buffer where the unconsumed bytes start
+        '_stream',    # file-like object being read from
+        'junk',       # number of non-frame, non-tag bytes skipped so far
+        'truncated',  # True if the stream ended partway through a frame
+    ]
+
+    def __init__(self, stream):
+        self._buffer = ''
+        self._offset = 0
+        self._stream = stream
+        self.junk = 0
+        self.truncated = False
+
+    def __iter__(self):
+        synced = False
+
+        while True:
+            head = self._peek(ID3V2_HEADER_SIZE)
+            if not head:
+                return
+
+            if head[:3] == 'ID3' and len(head) == ID3V2_HEADER_SIZE:
+                size = 0
+                for char in head[6:10]:  # "syncsafe" integer, 7 bits/byte
+                    size = (size << 7) | (ord(char) & 0x7F)
+                if ord(head[5]) & 0x10:  # has a footer
+                    size += ID3V2_HEADER_SIZE
+                self._skip(ID3V2_HEADER_SIZE + size)
+                continue
+
+            if head[:3] == 'TAG' and \
+                    len(self._peek(ID3V1_SIZE + 1)) == ID3V1_SIZE:
+                self._skip(ID3V1_SIZE)
+                continue
+
+            if head[0] == '\0':
+                synced = False
+                self._skip(1)
+                continue
+
+            header = parse_header(head)
+            if header:
+                lookahead = self._peek(header.length + 4)
+                following = lookahead[header.length:]
+
+                if len(lookahead) < header.length:
+                    if synced:
+                        self.truncated = True
+                        self._skip(len(lookahead))
+                        return
+
+                elif synced or len(following) < 4 or \
+                        following[:3] in ('ID3', 'TAG') or \
+                        following == '\0\0\0\0' or parse_header(following):
+                    synced = True
+                    self._skip(header.length)
+                    yield header, lookahead[:header.length]
+                    continue
+
+            synced = False
+            self.junk += 1
+            self._skip(1)
+
+    def _peek(self, size):
+        """Returns up to size bytes from the stream w/o consuming them."""
+
+        available = len(self._buffer) - self._offset
+        if available < size:
+            chunks = [self._buffer[self._offset:]]
+            while available < size:
+                chunk = self._stream.read(max(size - available, CHUNK_SIZE))
+                if not chunk:
+                    break
+                chunks.append(chunk)
+                available += len(chunk)
+            self._buffer = ''.join(chunks)
+            self._offset = 0
+
+        return self._buffer[self._offset:self._offset + size]
+
+    def _skip(self, size):
+        """Consumes size bytes from the stream."""
+
+        available = len(self._buffer) - self._offset
+        if size <= available:
+            self._offset += size
+        else:
+            self._buffer = ''
+            self._offset = 0
+            size -= available
+            while size > 0:
+                chunk = self._stream.read(min(size, CHUNK_SIZE))
+                if not chunk:
+                    break
+                size -= len(chunk)
+
+
+def join_mp3s(input_paths, output_stream):
+    """
+    Writes the audio frames from each of the MP3s at the given paths to
+    the output stream, one part after another, dropping each part's ID3
+    tags and Xing/Info/VBRI frames, so that the result is one clean
+    stream rather than several files glued together. Only one chunk of
+    each input is held in memory at a time.
+
+    The output ends with TRAILING_SILENCE seconds of silent frames in
+    the same format as the last part. Services pad their downloads for
+    players that cut off the last moments of audio, and that padding is
+    dropped along with the rest of each part's non-frame bytes, so this
+    stands in for it.
+
+    Raises ValueError if any of the inputs has no frames at all.
+    """
+
+    last_frame = None
+
+    for input_path in input_paths:
+        with open(input_path, 'rb') as input_stream:
+            frames = 0
+
+            for header, frame in Frames(input_stream):
+                frames += 1
+                if frames == 1 and is_info_frame(header, frame):
+                    continue
+                output_stream.write(frame)
+                last_frame = frame
+
+            if not frames:
+                raise ValueError("%s does not contain any MP3 audio" %
+                                 input_path)
+
+    if last_frame:
+        output_stream.write(silent_mp3(TRAILING_SILENCE, last_frame[:4]))
+
+
+def scan_mp3(stream):
+    """
+    Reads through the MP3 in the given file-like stream, returning a
+    bundle with the number of audio frames (not counting a leading
+    Xing/Info/VBRI frame), the duration of the audio in seconds, the
+    number of audio_bytes and junk bytes, and whether the stream was
+    truncated partway through a frame.
+    """
+
+    frames = Frames(stream)
+    count = audio_bytes = 0
+    duration = 0.0
+
+    for header, frame in frames:
+        if not count and is_info_frame(header, frame):
+            continue
+        count += 1
+        audio_bytes += len(frame)
+        duration += float(header.samples) / header.sample_rate
+
+    return Bundle(frames=count, duration=duration, audio_bytes=audio_bytes,
+                  junk=frames.junk, truncated=frames.truncated)
+
+
+def validate_mp3(path):
+    """
+    Checks that the file at the given path is a structurally sound MP3
+    with at least MIN_DURATION seconds of audio, returning the duration
+    if so. Raises a ValueError if the file is not audio at all (e.g. an
+    HTML error page), is cut short partway through a frame, is mostly
+    junk, or is too short.
+    """
+
+    with open(path, 'rb') as stream:
+        scan = scan_mp3(stream)
+
+    if not scan.frames:
+        raise ValueError("The file does not contain any MP3 audio (the "
+                         "service may have returned an error page)")
+    if scan.truncated:
+        raise ValueError("The MP3 ends partway through an audio frame "
+                         "(the download may have been cut short)")
+    if scan.junk > scan.audio_bytes:
+        raise ValueError("The MP3 is mostly not audio (%d bytes of junk "
+                         "vs. %d bytes of audio)" %
+                         (scan.junk, scan.audio_bytes))
+    if scan.duration < MIN_DURATION:
+        raise ValueError("The MP3 only has %.3f seconds of audio" %
+                         scan.duration)
+
+    return scan.duration
+
+
+def silent_mp3(seconds, header=SILENT_HEADER):
+    """
+    Returns the bytes of an MP3 with the given seconds of silence
+    (rounded to a whole number of frames, at least one). Each frame is
+    the header followed by all zeros, i.e. side information with no
+    main data, so it decodes to silence without needing an encoder.
+
+    A different four-byte frame header may be passed (e.g. to match the
+    format of other audio that the silence is to be joined onto); its
+    CRC and padding bits are cleared so every frame is the same length.
+    """
+
+    header = (header[0] + chr(ord(header[1]) | 0x01) +
+              chr(ord(header[2]) & 0xFD) + header[3])
+    parsed = parse_header(header)
+    frame = header + '\0' * (parsed.length - len(header))
+    frames = int(round(float(seconds) * parsed.sample_rate / parsed.samples))
+
+    return frame * max(1, frames)
+
+
+def parse_wav_header(head):
+    """
+    Given the beginning of a WAV stream, returns a bundle with its
+    format, channels, sample_rate, bits (per sample), byte_rate, and the
+    data_offset and data_size of its samples, or raises a ValueError if
+    it does not look like a usable WAV stream.
+
+    n.b. Binaries writing to a pipe cannot go back and fill in the data
+    size, so it may be bogus (e.g. zero or 0xFFFFFFFF) for such streams.
+    """
+
+    from struct import unpack_from
+
+    if len(head) < 12 or head[:4] != 'RIFF' or head[8:12] != 'WAVE':
+        raise ValueError("The audio is not a WAV stream")
+
+    fmt = None
+    offset = 12
+
+    while offset + 8 <= len(head):
+        chunk_id = head[offset:offset + 4]
+        chunk_size, = unpack_from('<I', head, offset + 4)
+
+        if chunk_id == 'fmt ':
+            if chunk_size < 16 or offset + 24 > len(head):
+                raise ValueError("The WAV stream has a bad format chunk")
+            fmt = unpack_from('<HHIIHH', head, offset + 8)
+
+        elif chunk_id == 'data':
+            if not fmt:
+                raise ValueError("The WAV stream has no format chunk")
+
+            tag, channels, sample_rate, byte_rate, _, bits = fmt
+            if not channels or not sample_rate or not byte_rate:
+                raise ValueError("The WAV stream has a bad format chunk")
+
+            return Bundle(format=tag, channels=channels,
+                          sample_rate=sample_rate, bits=bits,
+                          byte_rate=byte_rate, data_offset=offset + 8,
+                          data_size=chunk_size)
+
+        offset += 8 + chunk_size + (chunk_size & 1)
+
+    raise ValueError("The WAV stream has no data chunk")
+
+
+def sized_wav_header(head, header, data_size):
+    """
+    Given the beginning of a WAV stream and the bundle that was parsed
+    from it, returns the stream's header (i.e. everything before its
+    samples) with the RIFF size (whole stream, less 8 bytes) and data
+    chunk size set for a data chunk of data_size bytes.
+    """
+
+    from struct import pack
+
+    return ('RIFF' + pack('<I', header.data_offset - 8 + data_size) +
+            head[8:header.data_offset - 4] + pack('<I', data_size))
+
+
+def validate_wav(path):
+    """
+    Checks that the file at the given path is a WAV file with at least
+    MIN_DURATION seconds of audio, returning the duration if so or
+    raising a ValueError otherwise.
+    """
+
+    from os.path import getsize
+
+    with open(path, 'rb') as stream:
+        header = parse_wav_header(stream.read(CHUNK_SIZE))
+
+    data_size = min(header.data_size, getsize(path) - header.data_offset)
+    duration = float(data_size) / header.byte_rate
+
+    if duration < MIN_DURATION:
+        raise ValueError("The WAV only has %.3f seconds of audio" % duration)
+
+    return duration
+
+
+class SilenceTrimmer(object):
+    """
+    Trims the silence from the edges of a stream of PCM samples (e.g.
+    the data chunk of a WAV), keeping TRIM_MARGIN seconds of it at each
+    edge. Samples are fed in as they arrive and whatever can already be
+    passed on is returned, so only the silence at the current end of
+    the stream is ever held back in memory.
+
+    Silence is detected by taking the peak of each window of samples
+    with audioop, so the per-sample work happens in C.
+    """
+
+    __slots__ = [
+        '_bias',       # True if samples are unsigned (8-bit) and need biasing
+        '_heard',      # True once any non-silent window has been seen
+        '_margin',     # number of silent windows to keep at each edge
+        '_pending',    # deque of silent windows being held back
+        '_remainder',  # bytes left over that do not yet fill a window
+        '_threshold',  # peak sample value at or below which it is silent
+        '_width',      # bytes per sample
+        '_window',     # bytes per window
+    ]
+
+    SUPPORTED_BITS = [8, 16, 32]
+
+    def __init__(self, channels, sample_rate, bits):
+        """
+        Initialize for the given sample format, which must have one of
+        the SUPPORTED_BITS sample sizes.
+        """
+
+        assert bits in self.SUPPORTED_BITS, "unsupported sample size"
+
+        self._bias = bits == 8
+        self._heard = False
+        self._margin = max(1, int(round(TRIM_MARGIN / TRIM_WINDOW)))
+        self._pending = deque(maxlen=self._margin)
+        self._remainder = ''
+        self._threshold = int(2 ** (bits - 1) *
+                              10 ** (TRIM_THRESHOLD_DB / 20.0))
+        self._width = bits // 8
+        self._window = (self._width * channels *
+                        max(1, int(sample_rate * TRIM_WINDOW)))
+
+    def feed(self, data):
+        """
+        Takes the next bytes of the stream, returning the bytes that can
+        now be passed on.
+        """
+
+        data = self._remainder + data
+        usable = len(data) - len(data) % self._window
+        self._remainder = data[usable:]
+
+        output = []
+        for offset in xrange(0, usable, self._window):
+            window = data[offset:offset + self._window]
+            peak = audioop.max(audioop.bias(window, 1, -128) if self._bias
+                               else window, self._width)
+
+            if peak > self._threshold:
+                if not self._heard:
+                    self._heard = True
+                    self._pending = deque(self._pending)  # no maxlen now
+                output.extend(self._pending)
+                self._pending.clear()
+                output.append(window)
+
+            else:  # n.b. before anything is heard, only the margin is kept
+                self._pending.append(window)
+
+        return ''.join(output)
+
+    def finish(self):
+        """
+        Signals the end of the stream, returning the last bytes to be
+        passed on (i.e. the trailing margin of silence, if any).
+        """
+
+        if self._pending and len(self._pending) >= self._margin:
+            tail = list(self._pending)[:self._margin]
+        else:
+            tail = list(self._pending) + [self._remainder]
+
+        self._pending.clear()
+        self._remainder = ''
+        return ''.join(tail)
+
+
+def trim_wav(input_path, output_path):
+    """
+    Writes a copy of the WAV at input_path to output_path with the
+    silence at its edges trimmed, returning True, or returns False
+    without writing anything if the WAV's sample format is not one
+    that SilenceTrimmer supports.
+    """
+
+    with open(input_path, 'rb') as input_stream:
+        head = input_stream.read(CHUNK_SIZE)
+        header = parse_wav_header(head)
+
+        if header.format not in (1, 0xFFFE) or \
+                header.bits not in SilenceTrimmer.SUPPORTED_BITS:
+            return False
+
+        trimmer = SilenceTrimmer(header.channels, header.sample_rate,
+                                 header.bits)
+        remaining = min(header.data_size,
+                        os.path.getsize(input_path) - header.data_offset)
+
+        with open(output_path, 'wb') as output_stream:
+            output_stream.write(head[:header.data_offset])
+            written = 0
+
+            data = head[header.data_offset:header.data_offset + remaining]
+            while data:
+                remaining -= len(data)
+                trimmed = trimmer.feed(data)
+                output_stream.write(trimmed)
+                written += len(trimmed)
+                data = input_stream.read(min(remaining, CHUNK_SIZE))
+
+            trimmed = trimmer.finish()
+            output_stream.write(trimmed)
+            written += len(trimmed)
+
+            # n.b. fix up the sizes now that it is known how much was kept
+            output_stream.seek(0)
+            output_stream.write(sized_wav_header(head, header, written))
+
+    return True
+
+
+class Durations(object):
+    """
+    Keeps an index of MP3 durations (in seconds), keyed by path, that
+    persists between sessions. An entry is only trusted while the file's
+    size and modification time are unchanged, so a file that has been
+    replaced is probed again.
+
+    The index may be used from any thread.
+    """
+
+    __slots__ = [
+        '_dirty',    # True if there are entries that have not been saved
+        '_entries',  # dict mapping paths to (size, mtime, duration) lists
+        '_lock',     # guards _entries and _dirty
+        '_logger',   # logger-like interface with debug(), info(), etc.
+        '_path',     # path to the JSON file storing the index
+    ]
+
+    def __init__(self, path, logger):
+        self._dirty = False
+        self._entries = None
+        self._lock = Lock()
+        self._logger = logger
+        self._path = path
+
+    def get(self, path):
+        """
+        Returns the duration of the MP3 at the given path, probing it
+        (and remembering the result) if it is not already known, or
+        None if the file cannot be read.
+        """
+
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+
+        with self._lock:
+            entry = self._load().get(path)
+        if entry and entry[0] == stat.st_size and entry[1] == stat.st_mtime:
+            return entry[2]
+
+        try:
+            with open(path, 'rb') as stream:
+                duration = scan_mp3(stream).duration
+        except IOError:
+            return None
+
+        self._store(path, stat, duration)
+        return duration
+
+    def record(self, path, duration):
+        """
+        Remembers the duration of a file that has just been written and
+        already scanned by the caller (e.g. via validate_mp3()).
+        """
+
+        try:
+            self._store(path, os.stat(path), duration)
+        except OSError:
+            pass
+
+    def save(self):
+        """
+        Writes the index out, dropping entries for files that no longer
+        exist (e.g. those removed from the cache).
+        """
+
+        with self._lock:
+            if self._entries is None:
+                return  # n.b. never used, so there is nothing new to save
+
+            entries = {path: entry for path, entry in self._entries.items()
+                       if os.path.exists(path)}
+            if not self._dirty and len(entries) == len(self._entries):
+                return
+
+            self._entries = entries
+            self._dirty = False
+            entries = dict(entries)
+
+        try:
+            with open(self._path, 'w') as index:
+                json.dump(entries, index, separators=(',', ':'))
+            self._logger.debug("Saved %d entries to the duration index",
+                               len(entries))
+        except IOError as io_error:
+            self._logger.warn("Unable to save the duration index: %s",
+                              io_error)
+
+    def _load(self):
+        """
+        Returns the dict of entries, reading them in on first use. This
+        must be called with the lock held.
+        """
+
+        if self._entries is None:
+            try:
+                with open(self._path) as index:
+                    self._entries = json.load(index)
+            except (IOError, ValueError):
+                self._entries = {}
+
+        return self._entries
+
+    def _store(self, path, stat, duration):
+        """Adds an entry for the path w/ the given os.stat() result."""
+
+        with self._lock:
+            self._load()[path] = [stat.st_size, stat.st_mtime, duration]
+            self._dirty = True
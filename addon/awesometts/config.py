@@ -26,8 +26,12 @@ Storage and management of add-on configuration
 # TODO Would it be possible to get these configuration options to sync with
 #      AnkiWeb, e.g. by moving them into the collections database?
 
+import atexit
+import json
 import sqlite3
 
+from PyQt4 import QtCore
+
 __all__ = ['Config']
 
 
@@ -39,6 +43,18 @@ class Config(object):
 
     As an alternative to the dict-like interface, attributes may be used
     for both reading and assigning, and kwargs may be used for update().
+
+    One connection to the database is kept open (in WAL mode, where the
+    file system supports it), and changes are written out shortly after
+    they are made, so that a burst of them (e.g. from a dialog being
+    accepted) lands in a single transaction. The wait runs on the main
+    thread's event loop, so changes should only be made from the main
+    thread. Any changes still waiting are written out by flush(), which
+    also runs when Python exits.
+
+    Columns holding a dict (e.g. presets) can be kept in a keyed table
+    of their own instead, one row per dict entry, so that changing one
+    entry only rewrites that row.
     """
 
     class _LoggableCursor(sqlite3.Cursor):  # no init, pylint: disable=W0232
@@ -73,14 +89,23 @@ class Config(object):
         '_db',           # path to database, table name, normalize callable
         '_cols',         # map of official lookup names to column definitions
         '_cache',        # in-memory lookup of preferences
+        '_connection',   # SQLite3 connection, kept open between writes
         '_logger',       # where to send logging messages
         '_events',       # map of lookup names to the callable(s) they trigger
+        '_keyed',        # set of lookup names that are kept in keyed tables
+        '_pending',      # map of lookup names to encoded values not written
+        '_rows',         # map of keyed lookup names to their rows as stored
+        '_timer',        # single-shot QTimer for flush(), created on first use
     ]
 
-    def __init__(self, db, cols, logger, events=None):
+    # seconds to wait after a change for more to write out alongside it
+    WRITE_DELAY = 0.5
+
+    def __init__(self, db, cols, logger, events=None, keyed=None):
         """
         Given a database specification, list of column definitions,
-        logger, and optional event list, loads the configuration state.
+        logger, optional event list, and optional list of keyed column
+        names, loads the configuration state.
 
         The database specification should be a bundle, with:
 
@@ -104,6 +129,13 @@ class Config(object):
 
             - 0th: list of column names or single column name to trigger
             - 1th: callable when this value is loaded or updated
+
+        Each keyed column holds a dict and is stored in its own table
+        (e.g. general_presets), keyed by the dict's keys, instead of in
+        the main table, and its mapping functions are applied to each
+        entry rather than to the whole dict. If an older main table
+        still has the column, its dict is copied over the first time the
+        keyed table is created.
         """
 
         self._db = db
@@ -112,6 +144,10 @@ class Config(object):
             self._db.normalize(col[0]): col
             for col in cols
         }
+        self._keyed = set(
+            self._db.normalize(name)
+            for name in keyed or []
+        )
         self._logger = logger
 
         self._events = {}
@@ -120,8 +156,14 @@ class Config(object):
                 self.bind(triggers, callback)
 
         self._cache = {}
+        self._connection = None
+        self._pending = {}
+        self._rows = {}
+        self._timer = None
         self._load()
 
+        atexit.register(self.flush)
+
     def bind(self, triggers, callback):
         """
         Registers a callable to be called with the current state of the
@@ -150,19 +192,35 @@ class Config(object):
         If necessary, the database or table will be created with the
         default values. If they already exist, but a new column has been
         added, the already-existing table will be migrated to support
-        the new column(s) using the default value(s).
+        the new column(s) using the default value(s). Keyed columns are
+        read from (or moved into) their own tables.
         """
 
-        # open database connection
+        # open database connection, which flush() will go on to use
         connection = sqlite3.connect(self._db.path, isolation_level=None)
         connection.row_factory = sqlite3.Row
         cursor = connection.cursor(self._LoggableCursor)
         cursor.set_logger(self._logger)
 
+        # WAL mode lets a write skip syncing the whole database file; if
+        # the file system cannot support it, SQLite stays in its old mode
+        try:
+            mode = cursor.execute('PRAGMA journal_mode=WAL').fetchone()[0]
+            if mode.lower() == 'wal':
+                cursor.execute('PRAGMA synchronous=NORMAL')
+        except sqlite3.Error as exception:
+            self._logger.warn("Cannot switch to WAL mode: %s", exception)
+
+        main_cols = {
+            name: col
+            for name, col in self._cols.items()
+            if name not in self._keyed
+        }
+        existing_cols = []
+        row = None
+
         # check for existence of the configuration table
-        if len(cursor.execute('SELECT name FROM sqlite_master '
-                              'WHERE type=? AND name=?',
-                              ('table', self._db.table)).fetchall()):
+        if self._has_table(cursor, self._db.table):
             # detect existing columns
             existing_cols = [
                 meta['name'].lower()
@@ -173,7 +231,7 @@ class Config(object):
             # detect any new columns not present in database
             missing_cols = [
                 col
-                for col in self._cols.values()
+                for col in main_cols.values()
                 if col[0].lower() not in existing_cols
             ]
 
@@ -203,7 +261,7 @@ class Config(object):
             # populate in-memory store of the values from database
             row = cursor.execute('SELECT * FROM %s' % self._db.table) \
                 .fetchone()
-            for name, col in self._cols.items():
+            for name, col in main_cols.items():
                 # attempt to retrieve value; if it fails, use the default
                 try:
                     self._cache[name] = col[3](row[col[0]])
@@ -211,7 +269,7 @@ class Config(object):
                     self._cache[name] = col[2]
 
         else:
-            all_cols = self._cols.values()
+            all_cols = main_cols.values()
 
             self._logger.info("Creating new configuration table")
 
@@ -234,12 +292,46 @@ class Config(object):
             )
 
             # populate in-memory store with the defaults we just inserted
-            for name, col in self._cols.items():
+            for name, col in main_cols.items():
                 self._cache[name] = col[2]
 
-        # close database connection
+        for name in self._keyed:
+            col = self._cols[name]
+            table = self._keyed_table(col)
+
+            if not self._has_table(cursor, table):
+                self._logger.info("Creating new keyed table for %s", col[0])
+
+                # n.b. the primary key doubles as the index for lookups
+                cursor.execute('BEGIN')
+                cursor.execute('CREATE TABLE %s (name text PRIMARY KEY, '
+                               'value text)' % table)
+
+                # carry over the dict from a main table that predates this
+                if row and col[0].lower() in existing_cols:
+                    try:
+                        entries = json.loads(row[col[0]])
+                    except (TypeError, ValueError):
+                        entries = None
+
+                    if isinstance(entries, dict):
+                        for key, entry in entries.items():
+                            cursor.execute('INSERT INTO %s VALUES(?, ?)' %
+                                           table, (key, col[4](entry)))
+
+                cursor.execute('COMMIT')
+
+            # populate in-memory store of the entries from database
+            self._cache[name] = {}
+            self._rows[name] = {}
+            for entry_row in cursor.execute('SELECT name, value FROM %s' %
+                                            table):
+                key = entry_row['name']
+                self._cache[name][key] = col[3](entry_row['value'])
+                self._rows[name][key] = entry_row['value']
+
         cursor.close()
-        connection.close()
+        self._connection = connection
 
         # since this is the initial load, notify all registered event handlers
         unique_callbacks = set()
@@ -248,6 +340,19 @@ class Config(object):
         for callback in unique_callbacks:
             callback(self)
 
+    @staticmethod
+    def _has_table(cursor, table):
+        """Returns True if the database has the given table."""
+
+        return len(cursor.execute('SELECT name FROM sqlite_master '
+                                  'WHERE type=? AND name=?',
+                                  ('table', table)).fetchall()) > 0
+
+    def _keyed_table(self, col):
+        """Returns the name of the table holding the keyed column."""
+
+        return '%s_%s' % (self._db.table, col[0])
+
     def get(self, name, default=None):
         """
         Retrieve the current value for the given named configuration
@@ -316,29 +421,98 @@ class Config(object):
         for callback in unique_callbacks:
             callback(self)
 
-        # open database connection
-        connection = sqlite3.connect(self._db.path, isolation_level=None)
-        cursor = connection.cursor(self._LoggableCursor)
+        # queue up for the database, encoded now so that a value changed
+        # in-place before the write cannot alter what gets written
+        for name, col, value in updates:
+            self._pending[name] = (
+                {key: col[4](entry) for key, entry in value.items()}
+                if name in self._keyed
+                else col[4](value)
+            )
+
+        # restart the wait for more changes
+        if not self._timer:
+            self._timer = QtCore.QTimer()
+            self._timer.setSingleShot(True)
+            self._timer.timeout.connect(self.flush)
+        self._timer.start(int(self.WRITE_DELAY * 1000))
+
+    def flush(self):
+        """
+        Persists any values changed since the last write back to the
+        database in a single transaction.
+        """
+
+        if self._timer:
+            self._timer.stop()
+
+        if not self._pending or not self._connection:
+            return
+
+        pending = self._pending
+        self._pending = {}
+        updates = [
+            (self._cols[name], value)
+            for name, value in pending.items()
+            if name not in self._keyed
+        ]
+        rows = {
+            name: value
+            for name, value in pending.items()
+            if name in self._keyed
+        }
+
+        cursor = self._connection.cursor(self._LoggableCursor)
         cursor.set_logger(self._logger)
 
         # persist to SQLite3 database
-        cursor.execute(
-            'UPDATE %s SET %s' % (
-                self._db.table,
-                ', '.join([
-                    "%s=?" % col[0]
-                    for name, col, value in updates
-                ]),
-            ),
-            tuple(
-                col[4](value)
-                for name, col, value in updates
-            ),
-        )
+        try:
+            cursor.execute('BEGIN')
 
-        # close database connection
-        cursor.close()
-        connection.close()
+            if updates:
+                cursor.execute(
+                    'UPDATE %s SET %s' % (
+                        self._db.table,
+                        ', '.join([
+                            "%s=?" % col[0]
+                            for col, value in updates
+                        ]),
+                    ),
+                    tuple(value for _, value in updates),
+                )
+
+            # only the entries that were added, changed, or removed
+            for name, new_rows in rows.items():
+                table = self._keyed_table(self._cols[name])
+                old_rows = self._rows[name]
+
+                for key in old_rows:
+                    if key not in new_rows:
+                        cursor.execute('DELETE FROM %s WHERE name=?' %
+                                       table, (key,))
+
+                for key, value in new_rows.items():
+                    if old_rows.get(key) != value:
+                        cursor.execute('INSERT OR REPLACE INTO %s '
+                                       'VALUES(?, ?)' % table,
+                                       (key, value))
+
+            cursor.execute('COMMIT')
+
+        except sqlite3.Error as exception:
+            self._logger.error("Cannot save configuration: %s", exception)
+            try:
+                cursor.execute('ROLLBACK')
+            except sqlite3.Error:  # e.g. failed before or at BEGIN
+                pass
+            pending.update(self._pending)  # retry on the next flush
+            self._pending = pending
+
+        else:
+            self._rows.update(rows)
+
+        finally:
+            cursor.close()
 
     def __setattr__(self, name, value):
         """
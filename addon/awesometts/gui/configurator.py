@@ -59,11 +59,13 @@ class Configurator(Dialog):
         'strip_note_brackets', 'strip_note_parens', 'strip_template_braces',
         'strip_template_brackets', 'strip_template_parens', 'sub_note_cloze',
         'sub_template_cloze', 'sul_note', 'sul_template', 'throttle_sleep',
-        'throttle_threshold', 'tts_key_a', 'tts_key_q', 'updates_enabled',
+        'throttle_threshold', 'trim_silence', 'tts_key_a', 'tts_key_q',
+        'updates_enabled',
     ]
 
     _PROPERTY_WIDGETS = (Checkbox, QtGui.QComboBox, QtGui.QLineEdit,
-                         QtGui.QPushButton, QtGui.QSpinBox, QtGui.QListView)
+                         QtGui.QPushButton, QtGui.QSpinBox,
+                         QtGui.QDoubleSpinBox, QtGui.QListView)
 
     __slots__ = ['_alerts', '_ask', '_preset_editor', '_group_editor',
                  '_sul_compiler']
@@ -154,10 +156,11 @@ class Configurator(Dialog):
         for subkey, desc in [('onthefly', "on-the-fly <tts> tags"),
                              ('stored_ours', "AwesomeTTS [sound] tags"),
                              ('stored_theirs', "other [sound] tags")]:
-            spinner = QtGui.QSpinBox()
+            spinner = QtGui.QDoubleSpinBox()
             spinner.setObjectName(delay_key_prefix + subkey)
+            spinner.setDecimals(1)
             spinner.setRange(0, 30)
-            spinner.setSingleStep(1)
+            spinner.setSingleStep(0.1)
             spinner.setSuffix(" seconds")
             wait_widgets[subkey] = spinner
 
@@ -399,6 +402,8 @@ class Configurator(Dialog):
         vert = QtGui.QVBoxLayout()
         vert.addWidget(Note("Specify flags passed to lame when making MP3s."))
         vert.addWidget(flags)
+        vert.addWidget(Checkbox("Trim silence from the start and end of "
+                                "clips before transcoding", 'trim_silence'))
         vert.addWidget(Note("Affects %s. Changes are not retroactive to old "
                             "files." %
                             ', '.join(rtr.by_trait(rtr.Trait.TRANSCODING))))
@@ -618,7 +623,8 @@ class Configurator(Dialog):
                 widget.setText(key_combo_desc(widget.atts_value))
             elif isinstance(widget, QtGui.QComboBox):
                 widget.setCurrentIndex(max(widget.findData(value), 0))
-            elif isinstance(widget, QtGui.QSpinBox):
+            elif isinstance(widget, (QtGui.QSpinBox,
+                                     QtGui.QDoubleSpinBox)):
                 widget.setValue(value)
             elif isinstance(widget, QtGui.QListView):
                 widget.setModel(value)
@@ -659,7 +665,8 @@ class Configurator(Dialog):
             widget.objectName(): (
                 widget.isChecked() if isinstance(widget, Checkbox)
                 else widget.atts_value if isinstance(widget, QtGui.QPushButton)
-                else widget.value() if isinstance(widget, QtGui.QSpinBox)
+                else widget.value() if isinstance(widget, (
+                    QtGui.QSpinBox, QtGui.QDoubleSpinBox))
                 else widget.itemData(widget.currentIndex()) if isinstance(
                     widget, QtGui.QComboBox)
                 else [
@@ -23,6 +23,7 @@
 File generation dialogs
 """
 
+from collections import deque
 from re import compile as re
 from PyQt4 import QtCore, QtGui
 
@@ -251,6 +252,11 @@ class BrowserGenerator(ServiceDialog):
 
         self._disable_inputs()
 
+        # sanitize every note's source field up front, in one batch
+        phrases = self._addon.strip.from_note.batch(
+            [note[source] for note in eligible_notes]
+        )
+
         svc_id = now['last_service']
         options = (None if svc_id.startswith('group:') else
                    now['last_options'][now['last_service']])
@@ -277,7 +283,7 @@ class BrowserGenerator(ServiceDialog):
                 'append': append,
                 'behavior': behavior,
             },
-            'queue': eligible_notes,
+            'queue': deque(zip(eligible_notes, phrases)),
             'counts': {
                 'total': len(self._notes),
                 'elig': len(eligible_notes),
@@ -298,7 +304,28 @@ class BrowserGenerator(ServiceDialog):
         self._process['progress'].show()
         self._browser.model.beginReset()
 
-        self._accept_next()
+        if svc_id.startswith('group:') or \
+                not self._addon.router.can_batch(svc_id):
+            self._accept_next()
+            return
+
+        # For services that can synthesize many clips per engine call, warm
+        # the cache first; the note-by-note calls then mostly hit the cache.
+        self._accept_update("Synthesizing clips in batches")
+        self._addon.router.batch(
+            svc_id=svc_id,
+            texts=phrases,
+            options=options,
+            callbacks=dict(
+                okay=lambda count: self._accept_next(),
+                fail=lambda exception: self._accept_next(),
+                progress=lambda finished, total: self._accept_update(
+                    "Synthesizing clips in batches (%d of %d)" %
+                    (finished, total)
+                ),
+                stop=lambda: self._process['aborted'],
+            ),
+        )
 
     def _accept_abort(self):
         """
@@ -334,9 +361,7 @@ class BrowserGenerator(ServiceDialog):
             timer.start()
             return
 
-        note = proc['queue'].pop(0)
-        phrase = note[proc['fields']['source']]
-        phrase = self._addon.strip.from_note(phrase)
+        note, phrase = proc['queue'].popleft()
         self._accept_update(phrase)
 
         def done():
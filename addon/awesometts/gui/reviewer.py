@@ -27,6 +27,8 @@ because interacts with the GUI components of Anki and it also spawns
 alert windows. It also may have more visual components in the future.
 """
 
+from collections import deque, OrderedDict
+from itertools import izip_longest
 import re
 
 from BeautifulSoup import BeautifulSoup
@@ -94,12 +96,30 @@ class Reviewer(object):
         '_addon',
         '_alerts',
         '_mw',
+        '_parsed',    # OrderedDict of card side keys to tags, oldest first
+        '_prefetch',  # dict with the state of answer and lookahead prefetching
     ]
 
+    # most card sides kept in the cache of parsed tags
+    PARSED_SIZE = 64
+
+    # number of upcoming cards whose on-the-fly tags are prefetched
+    PREFETCH_CARDS = 5
+
+    # most prefetch calls in flight at once, so that the router's threads
+    # are mostly left for the clips that the user is actually waiting on
+    PREFETCH_PARALLEL = 2
+
+    # most prefetch calls made over the course of one review session
+    PREFETCH_BUDGET = 200
+
     def __init__(self, addon, alerts, mw):
         self._addon = addon
         self._alerts = alerts
         self._mw = mw
+        self._parsed = OrderedDict()
+        self._prefetch = None
+        self.prefetch_cancel()
 
     def card_handler(self, state, card):
         """
@@ -111,12 +131,12 @@ class Reviewer(object):
         config = self._addon.config
 
         if state == 'question' and config['automatic_questions']:
-            self._play_html('front', card.q(),
+            self._play_html('front', card,
                             self._addon.player.otf_question, self._mw,
                             show_errors=config['automatic_questions_errors'])
 
         elif state == 'answer' and config['automatic_answers']:
-            self._play_html('back', self._get_answer(card),
+            self._play_html('back', card,
                             self._addon.player.otf_answer, self._mw,
                             show_errors=config['automatic_answers_errors'])
 
@@ -148,13 +168,13 @@ class Reviewer(object):
 
         question_combo = self._addon.config['tts_key_q']
         if question_combo and combo == question_combo:
-            self._play_html('front', card.q(),
+            self._play_html('front', card,
                             self._addon.player.otf_shortcut, self._mw)
             handled = True
 
         answer_combo = self._addon.config['tts_key_a']
         if state == 'answer' and answer_combo and combo == answer_combo:
-            self._play_html('back', self._get_answer(card),
+            self._play_html('back', card,
                             self._addon.player.otf_shortcut, self._mw)
             handled = True
 
@@ -189,10 +209,48 @@ class Reviewer(object):
 
         return answer_html
 
-    def _play_html(self, side, html, playback, parent, show_errors=True):
+    def _get_tags(self, side, card):
+        """
+        Returns a tuple with the list of <tts> tags and the list of
+        old-style bracket tags on the given side ('front' or 'back') of
+        the card.
+
+        The card side is only rendered and parsed again if the card, its
+        note, or its template has changed since it was last looked at,
+        e.g. replays of the same card come straight out of the cache.
+        """
+
+        try:
+            template = card.template()
+            key = (card.id, side, card.note().mod, card.model()['mod'],
+                   template['qfmt'], template['afmt'])
+        except (AttributeError, KeyError, TypeError):  # e.g. a stub card
+            key = None
+
+        parsed = self._parsed
+        if key:
+            try:
+                tags = parsed.pop(key)
+            except KeyError:
+                pass
+            else:
+                parsed[key] = tags  # n.b. moves it to the newest position
+                return tags
+
+        html = card.q() if side == 'front' else self._get_answer(card)
+        tags = (BeautifulTTS(html)('tts'), self.RE_LEGACY_TAGS.findall(html))
+
+        if key:
+            parsed[key] = tags
+            if len(parsed) > self.PARSED_SIZE:
+                parsed.popitem(last=False)
+
+        return tags
+
+    def _play_html(self, side, card, playback, parent, show_errors=True):
         """
-        Read in the passed HTML, attempt to discover <tts> tags in it,
-        and pass them to the router for processing.
+        Looks up the <tts> tags on the given side of the card and passes
+        them to the router for processing.
 
         Additionally, old-style [GTTS], [TTS], and [ATTS] tags are
         detected and played back, e.g.
@@ -236,11 +294,13 @@ class Reviewer(object):
             else:
                 self._addon.logger.warn("State changed; not playing audio")
 
-        for tag in BeautifulTTS(html)('tts'):
+        tags, legacies = self._get_tags(side, card)
+
+        for tag in tags:
             self._play_html_tag(tag, from_template, playback_wrapper,
                                 parent, show_errors)
 
-        for legacy in self.RE_LEGACY_TAGS.findall(html):
+        for legacy in legacies:
             self._play_html_legacy(legacy, from_template, playback_wrapper,
                                    parent, show_errors)
 
@@ -340,43 +400,51 @@ class Reviewer(object):
             ),
         )
 
-    def _play_html_legacy(self, legacy, from_template, playback, parent,
-                          show_errors=True):
-        """Helper method for _play_html()."""
+    @staticmethod
+    def _parse_legacy(legacy):
+        """
+        Returns the service ID, voice, and (unsanitized) text of an
+        old-style bracket tag, raising a ValueError if it is missing
+        any of those.
+        """
 
         components = legacy[1].split(':')
 
         if legacy[0] and legacy[0].strip().lower() == 'g':
             if len(components) < 2:
-                if show_errors:
-                    self._play_html_legacy_bad(
-                        legacy,
-                        "Old-style GTTS bracket tags must specify the "
-                        "voice, e.g. [GTTS:es:hola], [GTTS:es:{{Front}}], "
-                        "[GTTS:en:{{text:Back}}]",
-                        parent,
-                    )
-                return
+                raise ValueError(
+                    "Old-style GTTS bracket tags must specify the "
+                    "voice, e.g. [GTTS:es:hola], [GTTS:es:{{Front}}], "
+                    "[GTTS:en:{{text:Back}}]"
+                )
 
             svc_id = 'yandex'
 
         else:
             if len(components) < 3:
-                if show_errors:
-                    self._play_html_legacy_bad(
-                        legacy,
-                        "Old-style TTS bracket tags must specify service and "
-                        "voice, e.g. [TTS:g:es:mundo], [TTS:g:es:{{Front}}], "
-                        "[TTS:g:en:{{text:Back}}]",
-                        parent,
-                    )
-                return
+                raise ValueError(
+                    "Old-style TTS bracket tags must specify service and "
+                    "voice, e.g. [TTS:g:es:mundo], [TTS:g:es:{{Front}}], "
+                    "[TTS:g:en:{{text:Back}}]"
+                )
 
             svc_id = components.pop(0)
 
         voice = components.pop(0)
 
-        text = ':'.join(components)
+        return svc_id, voice, ':'.join(components)
+
+    def _play_html_legacy(self, legacy, from_template, playback, parent,
+                          show_errors=True):
+        """Helper method for _play_html()."""
+
+        try:
+            svc_id, voice, text = self._parse_legacy(legacy)
+        except ValueError as exception:
+            if show_errors:
+                self._play_html_legacy_bad(legacy, exception.message, parent)
+            return
+
         text = from_template(text)
         if not text:
             return
@@ -405,6 +473,218 @@ class Reviewer(object):
             parent,
         )
 
+    def prefetch_handler(self):
+        """
+        Called as a question is shown, speculatively queues up prefetch
+        calls for the on-the-fly tags on the answer side of the card, so
+        that flipping it plays from the cache. These go ahead of any
+        others, and do not count against the budget. Any still queued
+        or underway for the previous card (e.g. if it was buried or
+        skipped before being flipped) are cancelled.
+
+        Then, looks ahead at the next few cards in the scheduler's queues
+        and queues up prefetch calls for the on-the-fly tags on the sides
+        of them that would be played automatically, so that their clips
+        are likely to be cached by the time that they are shown.
+        """
+
+        state = self._prefetch
+        try:
+            card = self._mw.reviewer.card
+        except AttributeError:
+            card = None
+        token = ('answer', card.id) if card else None
+
+        if token != state['answer_token']:
+            state['answer'].clear()
+            if state['answer_token']:
+                self._addon.router.cancel(state['answer_token'])
+            state['answer_token'] = token
+
+        config = self._addon.config
+        sides = [side for side, key in [('front', 'automatic_questions'),
+                                        ('back', 'automatic_answers')]
+                 if config[key]]
+        if not sides:
+            return
+
+        if card and 'back' in sides:
+            state['answer'].clear()
+            state['answer'].extend(self._prefetch_requests('back', card))
+
+        for card in self._upcoming_cards(self.PREFETCH_CARDS):
+            for side in sides:
+                for request in self._prefetch_requests(side, card):
+                    key = (request[0], request[1],
+                           tuple(sorted(request[2].items())))
+                    if key not in state['seen']:
+                        state['seen'].add(key)
+                        state['queue'].append(request)
+
+        self._prefetch_next()
+
+    def prefetch_cancel(self):
+        """
+        Drops all prefetch calls not yet made, cancels those underway
+        (see Router.cancel() for which ones can be stopped), and resets
+        the budget, e.g. when a review session ends.
+        """
+
+        if self._prefetch:
+            self._addon.router.cancel(('lookahead',
+                                       self._prefetch['generation']))
+            if self._prefetch['answer_token']:
+                self._addon.router.cancel(self._prefetch['answer_token'])
+
+        self._prefetch = dict(
+            answer=deque(),
+            answer_token=None,
+            budget=self.PREFETCH_BUDGET,
+            generation=(self._prefetch['generation'] + 1
+                        if self._prefetch else 0),
+            queue=deque(),
+            running=0,
+            seen=set(),
+            submitting=False,
+        )
+
+    def _upcoming_cards(self, count):
+        """
+        Returns up to count cards that the scheduler has queued up to
+        show next, without taking them off of its queues. Learning cards
+        come first, then reviews and new cards, alternating; this is
+        only a guess at the order in which they will actually be shown.
+        """
+
+        try:
+            sched = self._mw.col.sched
+            current_id = self._mw.reviewer.card.id
+        except AttributeError:
+            return []
+
+        # n.b. these are the scheduler's internal queues, which it pops
+        # from the end (or, for intraday learning, from the heap's top)
+        learning = [entry[1] for entry in
+                    sorted(getattr(sched, '_lrnQueue', None) or [])]
+        learning += reversed(getattr(sched, '_lrnDayQueue', None) or [])
+        reviews = list(reversed(getattr(sched, '_revQueue', None) or []))
+        new = list(reversed(getattr(sched, '_newQueue', None) or []))
+
+        card_ids = []
+        for card_id in learning + [card_id
+                                   for pair in izip_longest(reviews, new)
+                                   for card_id in pair]:
+            if card_id and card_id != current_id and \
+                    card_id not in card_ids:
+                card_ids.append(card_id)
+                if len(card_ids) == count:
+                    break
+
+        cards = []
+        for card_id in card_ids:
+            try:
+                cards.append(self._mw.col.getCard(card_id))
+            except Exception:  # catch all, pylint:disable=W0703
+                pass  # e.g. the card was deleted since it was queued
+        return cards
+
+    def _prefetch_requests(self, side, card):
+        """
+        Returns a list of (svc_id, text, options) tuples for the tags on
+        the given side of the card, skipping any that are broken or that
+        use a group (as which preset a group plays is only decided upon
+        playback).
+        """
+
+        from_template = (self._addon.strip.from_template_back
+                         if side == 'back'
+                         else self._addon.strip.from_template_front)
+        presets = self._addon.config['presets']
+        requests = []
+
+        try:
+            tags, legacies = self._get_tags(side, card)
+        except Exception:  # catch all, pylint:disable=W0703
+            return requests
+
+        for tag in tags:
+            attr = dict(tag.attrs)
+            if 'group' in attr:
+                continue
+            if 'preset' in attr:
+                attr = lax_dict_lookup(presets, attr['preset'],
+                                       return_none=True)
+                if not attr:
+                    continue
+                attr = dict(attr)
+
+            svc_id = attr.pop('service', None)
+            text = svc_id and from_template(unicode(tag))
+            if text:
+                requests.append((svc_id, text, attr))
+
+        for legacy in legacies:
+            try:
+                svc_id, voice, text = self._parse_legacy(legacy)
+            except ValueError:
+                continue
+
+            text = from_template(text)
+            if text:
+                requests.append((svc_id, text, {'voice': voice}))
+
+        return requests
+
+    def _prefetch_next(self):
+        """
+        Makes queued prefetch calls, answer side of the current card
+        first, while the number in flight and the budget allow it.
+        """
+
+        state = self._prefetch
+        if state['submitting']:
+            return  # n.b. a cache hit called back before the router returned
+
+        state['submitting'] = True
+        try:
+            while state['running'] < self.PREFETCH_PARALLEL:
+                if state['answer']:
+                    svc_id, text, options = state['answer'].popleft()
+                    token = state['answer_token']
+                elif state['queue'] and state['budget'] > 0:
+                    svc_id, text, options = state['queue'].popleft()
+                    token = ('lookahead', state['generation'])
+                    state['budget'] -= 1
+                else:
+                    break
+
+                state['running'] += 1
+
+                self._addon.router(
+                    svc_id=svc_id,
+                    text=text,
+                    options=options,
+                    callbacks=dict(
+                        okay=lambda path: None,
+                        fail=lambda exception: None,
+                        then=lambda generation=state['generation']:
+                        self._prefetch_done(generation),
+                    ),
+                    prefetch=token,
+                )
+        finally:
+            state['submitting'] = False
+
+    def _prefetch_done(self, generation):
+        """Moves on to the next prefetch call, unless cancelled."""
+
+        state = self._prefetch
+        if generation != state['generation']:
+            return
+
+        state['running'] -= 1
+        self._prefetch_next()
+
     def selection_handler(self, text, preset, parent):
         """Play the selected text using the preset."""
 
@@ -441,11 +721,11 @@ class Reviewer(object):
         """Play on-the-fly text from the specified card side."""
 
         if state == 'question':
-            self._play_html('front', card.q(),
+            self._play_html('front', card,
                             self._addon.player.menu_click, parent)
 
         elif state == 'answer':
-            self._play_html('back', self._get_answer(card),
+            self._play_html('back', card,
                             self._addon.player.menu_click, parent)
 
     def has_tts(self, state, card):
@@ -454,12 +734,14 @@ class Reviewer(object):
         specified card side might have playable TTS on it.
         """
 
-        html = (card.q() if state == 'question'
-                else self._get_answer(card) if state == 'answer'
-                else None)
+        if state not in ['answer', 'question']:
+            return False
 
-        return html and (BeautifulTTS(html)('tts') or
-                         self.RE_LEGACY_TAGS.search(html))
+        tags, legacies = self._get_tags(
+            'front' if state == 'question' else 'back',
+            card,
+        )
+        return bool(tags or legacies)
 
 
 class BeautifulTTS(BeautifulSoup):  # pylint:disable=abstract-method
@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+
+# AwesomeTTS text-to-speech add-on for Anki
+#
+# Copyright (C) 2016       Anki AwesomeTTS Development Team
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Event-driven HTTP requests on the main thread's event loop
+"""
+
+from httplib import HTTPMessage
+from StringIO import StringIO
+from urllib2 import HTTPError, URLError
+
+from PyQt4 import QtCore, QtNetwork
+
+from .bundle import Bundle
+
+__all__ = ['Network']
+
+
+class Network(QtCore.QObject):
+    """
+    Runs HTTP requests through Qt's network access manager, which
+    multiplexes every request onto the event loop of the main thread.
+    Unlike urllib2, an in-flight request does not tie up a thread of
+    its own, so any number of downloads may be underway at once.
+
+    Results are handed back via callbacks, always on the main thread.
+    """
+
+    __slots__ = [
+        '_context',  # tag given to requests started now, for abort()
+        '_logger',   # logger-like interface with debug(), info(), etc.
+        '_manager',  # QNetworkAccessManager instance, created on first use
+        '_replies',  # map of in-flight replies to their request state
+        '_timeout',  # seconds to wait on a request before aborting it
+    ]
+
+    MAX_REDIRECTS = 5
+
+    def __init__(self, logger, timeout=15, *args, **kwargs):
+        """
+        Initialize with a logger and the number of seconds after which
+        an unfinished request should be aborted.
+        """
+
+        super(Network, self).__init__(*args, **kwargs)
+
+        self._context = None
+        self._logger = logger
+        self._manager = None
+        self._replies = {}
+        self._timeout = timeout
+
+    def count(self):
+        """Returns the number of requests that are currently in-flight."""
+
+        return len(self._replies)
+
+    def within(self, context, func):
+        """
+        Calls func, tagging any requests it starts with the given
+        context. Requests started from their callbacks (e.g. the next
+        download of a multi-part clip) carry the same tag, so that the
+        whole chain can be cancelled together using abort().
+        """
+
+        previous = self._context
+        self._context = context
+        try:
+            return func()
+        finally:
+            self._context = previous
+
+    def abort(self, context):
+        """
+        Aborts every in-flight request tagged with the given context,
+        failing each one with a URLError.
+        """
+
+        for reply, state in self._replies.items():
+            if state['context'] == context:
+                self._logger.debug("Aborting %s", reply.url().toEncoded())
+                state['aborted'] = True
+                reply.abort()  # n.b. this triggers _on_finished()
+
+    def request(self, url, callbacks, method='GET', data=None, headers=None):
+        """
+        Starts a request for the given (already-encoded) URL, returning
+        immediately. The callbacks parameter is a dict containing:
+
+            - 'okay' (required): called with a bundle containing the
+              final url, HTTP code, mime, headers (as an HTTPMessage,
+              just like urllib2 gives), and payload
+            - 'fail' (required): called with an exception if the request
+              could not be completed or the server returned an error
+
+        Like urllib2, redirects are followed automatically, HTTP errors
+        are reported using HTTPError, and connectivity problems (e.g.
+        timeouts) are reported using URLError.
+        """
+
+        assert method in ['GET', 'HEAD', 'POST'], \
+            "method must be GET, HEAD, or POST"
+        assert 'okay' in callbacks and callable(callbacks['okay'])
+        assert 'fail' in callbacks and callable(callbacks['fail'])
+
+        if isinstance(url, unicode):
+            url = url.encode('utf-8')
+
+        self._start(QtCore.QUrl.fromEncoded(url), callbacks, method, data,
+                    headers or {}, self.MAX_REDIRECTS)
+
+    def _start(self, url, callbacks, method, data, headers, redirects):
+        """Issues the request and registers it as in-flight."""
+
+        if not self._manager:
+            self._manager = QtNetwork.QNetworkAccessManager(self)
+
+        request = QtNetwork.QNetworkRequest(url)
+        for key, value in headers.items():
+            request.setRawHeader(key, value)
+
+        if method == 'POST':
+            request.setHeader(QtNetwork.QNetworkRequest.ContentTypeHeader,
+                              'application/x-www-form-urlencoded')
+            reply = self._manager.post(request, data or '')
+        elif method == 'HEAD':
+            reply = self._manager.head(request)
+        else:
+            reply = self._manager.get(request)
+
+        timer = QtCore.QTimer(self)
+        timer.setSingleShot(True)
+        timer.timeout.connect(lambda: self._on_timeout(reply))
+        timer.start(self._timeout * 1000)
+
+        self._replies[reply] = dict(aborted=False, callbacks=callbacks,
+                                    context=self._context, headers=headers,
+                                    method=method, redirects=redirects,
+                                    timer=timer, timed_out=False)
+        reply.finished.connect(lambda: self._on_finished(reply))
+
+        self._logger.debug("Started %s %s on event loop; in-flight=%d",
+                           method, url.toEncoded(), len(self._replies))
+
+    def _on_timeout(self, reply):
+        """Flags the reply as timed out and aborts it."""
+
+        if reply in self._replies:
+            self._replies[reply]['timed_out'] = True
+            reply.abort()  # n.b. this triggers _on_finished()
+
+    def _on_finished(self, reply):
+        """
+        Retires a finished reply and handles it under the context that
+        its request was started with.
+        """
+
+        state = self._replies.pop(reply)
+        state['timer'].stop()
+        state['timer'].deleteLater()
+        reply.deleteLater()
+
+        self.within(state['context'], lambda: self._handle(reply, state))
+
+    def _handle(self, reply, state):
+        """
+        Examines a finished reply, following redirects or passing the
+        outcome on to the caller's callbacks.
+        """
+
+        url = str(reply.url().toEncoded())
+        code = reply.attribute(
+            QtNetwork.QNetworkRequest.HttpStatusCodeAttribute)
+        callbacks = state['callbacks']
+
+        if state['aborted']:
+            callbacks['fail'](URLError("cancelled"))
+            return
+
+        if state['timed_out']:
+            callbacks['fail'](URLError("timed out"))
+            return
+
+        if code is None:
+            callbacks['fail'](URLError(reply.errorString() or
+                                       "no response for %s" % url))
+            return
+
+        target = reply.attribute(
+            QtNetwork.QNetworkRequest.RedirectionTargetAttribute)
+        if target and code in [301, 302, 303, 307]:
+            if state['redirects'] < 1:
+                callbacks['fail'](HTTPError(url, code, "Too many redirects",
+                                            None, None))
+                return
+
+            target = reply.url().resolved(target)
+            self._logger.debug("Following %d redirect to %s", code,
+                               target.toEncoded())
+            self._start(target, callbacks,
+                        'HEAD' if state['method'] == 'HEAD' else 'GET',
+                        None, state['headers'], state['redirects'] - 1)
+            return
+
+        if code >= 400:
+            callbacks['fail'](HTTPError(url, code, reply.errorString(),
+                                        None, None))
+            return
+
+        mime = reply.header(QtNetwork.QNetworkRequest.ContentTypeHeader)
+        mime = (mime.split(';')[0].strip().lower() if mime
+                else 'text/plain')  # same fallback as mimetools.Message
+
+        # n.b. Qt joins repeated headers (e.g. Set-Cookie) w/ newlines, so
+        # those are split back out so that HTTPMessage can join them the same
+        # way that it does for urllib2 responses
+        headers = HTTPMessage(StringIO(''.join(
+            '%s: %s\r\n' % (key.data(), value)
+            for key in reply.rawHeaderList()
+            for value in reply.rawHeader(key).data().split('\n')
+        ) + '\r\n'))
+
+        callbacks['okay'](Bundle(
+            url=url,
+            code=code,
+            mime=mime,
+            headers=headers,
+            payload=reply.readAll().data(),
+        ))
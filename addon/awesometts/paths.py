@@ -32,7 +32,10 @@ __all__ = [
     'ADDON_IS_LINKED',
     'CACHE',
     'CONFIG',
+    'DURATIONS',
     'LOG',
+    'RESPONSES',
+    'SILENCE',
     'TEMP',
 ]
 
@@ -53,6 +56,16 @@ if not os.path.isdir(CACHE):
 
 CONFIG = os.path.join(ADDON, 'config.db')
 
+DURATIONS = os.path.join(ADDON, 'durations.json')
+
 LOG = os.path.join(ADDON, 'addon.log')
 
+RESPONSES = os.path.join(ADDON, '.responses')
+if not os.path.isdir(RESPONSES):
+    os.mkdir(RESPONSES)
+
+SILENCE = os.path.join(ADDON, '.silence')
+if not os.path.isdir(SILENCE):
+    os.mkdir(SILENCE)
+
 TEMP = tempfile.gettempdir()
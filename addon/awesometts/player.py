@@ -22,8 +22,11 @@
 Playback interface, providing user-configured delays
 """
 
-import inspect
+import os
+import sys
+from tempfile import mkstemp
 
+from .audio import silent_mp3
 from .text import RE_FILENAMES
 
 __all__ = ['Player']
@@ -33,17 +36,32 @@ class Player(object):
     """Once instantiated, provides interfaces for playing audio."""
 
     __slots__ = [
-        '_anki',    # bundle with mw, native (play function), sound (module)
-        '_blank',   # path to a blank 1-second MP3
-        '_config',  # dict-like interface for looking up user configuration
-        '_logger',  # logger-like interface for debugging the Player instance
+        '_anki',       # bundle with mw, native (play function), sound (module)
+        '_blank',      # path to a blank 1-second MP3
+        '_config',     # dict-like interface for looking up user configuration
+        '_durations',  # index for looking up the lengths of MP3s
+        '_logger',     # logger-like interface for debugging the Player
+        '_silence',    # directory to keep silent MP3s of various lengths in
     ]
 
-    def __init__(self, anki, blank, config, logger=None):
+    def __init__(self, anki, blank, config, durations, silence,
+                 logger=None):
         self._anki = anki
         self._blank = blank
         self._config = config
+        self._durations = durations
         self._logger = logger
+        self._silence = silence
+
+    def queued_seconds(self):
+        """
+        Returns an estimate of how many seconds of audio are waiting in
+        Anki's playback queue, not counting any clips whose durations
+        cannot be determined.
+        """
+
+        return sum(self._durations.get(path) or 0.0
+                   for path in list(self._anki.sound.mplayerQueue))
 
     def preview(self, path):
         """Play path with no delay, from preview button."""
@@ -95,10 +113,7 @@ class Player(object):
         if self._anki.mw.state != 'review':
             self._insert_blanks(0, "wrapped, non-review", path)
 
-        elif next((True
-                   for frame in inspect.stack()
-                   if frame[3] in self.native_wrapper.BLACKLISTED_FRAMES),
-                  False):
+        elif self._called_from(self.native_wrapper.BLACKLISTED_FRAMES):
             self._insert_blanks(0, "wrapped, blacklisted caller", path)
 
         elif self._anki.mw.reviewer.state == 'question':
@@ -141,6 +156,21 @@ class Player(object):
         'replayAudio',  # if the user strikes R or F5
     ]
 
+    @staticmethod
+    def _called_from(names):
+        """
+        Returns True if any caller up the stack is a function with one
+        of the given names. Only code objects are looked at, so unlike
+        inspect.stack(), no source files are read along the way.
+        """
+
+        frame = sys._getframe(1)  # pylint:disable=protected-access
+        while frame:
+            if frame.f_code.co_name in names:
+                return True
+            frame = frame.f_back
+        return False
+
     def _insert_blanks(self, seconds, reason, path):
         """
         Insert silence of the given seconds, unless Anki's queue has
@@ -149,12 +179,75 @@ class Player(object):
 
         if self._anki.sound.mplayerQueue:
             if self._logger:
-                self._logger.debug("Ignoring %d-second delay (%s) because of "
-                                   "queue: %s", seconds, reason, path)
+                self._logger.debug("Ignoring %.1f-second delay (%s) because "
+                                   "of %d-clip queue: %s", seconds, reason,
+                                   len(self._anki.sound.mplayerQueue), path)
+            return
+
+        if not seconds:
             return
 
+        silence = self._silent_clip(seconds)
+        if silence:
+            if self._logger:
+                self._logger.debug("Need %.1f-second delay (%s) w/ %s: %s",
+                                   seconds, reason, silence, path)
+            self._anki.native(silence)
+            return
+
+        # n.b. the blank clip is not exactly one second long, so the number
+        # of times it is queued is based on its actual duration
+        blank_seconds = self._durations.get(self._blank) or 1.0
+        blanks = max(1, int(round(seconds / blank_seconds)))
+
         if self._logger:
-            self._logger.debug("Need %d-second delay (%s): %s",
-                               seconds, reason, path)
-        for _ in range(seconds):
+            self._logger.debug("Need %.1f-second delay (%s) w/ %d blank(s) "
+                               "totaling %.2f seconds: %s", seconds, reason,
+                               blanks, blanks * blank_seconds, path)
+        for _ in range(blanks):
             self._anki.native(self._blank)
+
+    def _silent_clip(self, seconds):
+        """
+        Returns the path to a silent MP3 of the given seconds (rounded
+        to the nearest tenth), writing it out first if this is the first
+        time that length has been needed (or if the file there is not
+        the right size, e.g. from an interrupted write). Returns None if
+        the clip does not exist and cannot be written.
+        """
+
+        tenths = int(round(seconds * 10))
+        if tenths < 1:
+            return None
+
+        payload = silent_mp3(tenths / 10.0)
+        path = os.path.join(self._silence, 'silence_%03d.mp3' % tenths)
+        try:
+            if os.path.getsize(path) == len(payload):
+                return path
+        except OSError:
+            pass
+
+        # n.b. written to a temporary file next to the clip and renamed,
+        # so that a player never gets a partially-written file
+        partial_path = None
+        try:
+            handle, partial_path = mkstemp(dir=self._silence, suffix='.part')
+            with os.fdopen(handle, 'wb') as output:
+                output.write(payload)
+            try:
+                os.rename(partial_path, path)
+            except OSError:  # e.g. Windows, which will not replace a file
+                os.remove(path)
+                os.rename(partial_path, path)
+        except (IOError, OSError) as error:
+            if self._logger:
+                self._logger.warn("Unable to write %s: %s", path, error)
+            if partial_path:
+                try:
+                    os.remove(partial_path)
+                except OSError:
+                    pass
+            return None
+
+        return path
@@ -33,6 +33,7 @@ from urllib2 import URLError
 
 from PyQt4 import QtCore, QtGui
 
+from .audio import validate_mp3
 from .service import Trait as BaseTrait
 
 __all__ = ['Router']
@@ -40,6 +41,10 @@ __all__ = ['Router']
 
 _SIGNAL = QtCore.SIGNAL('awesomeTtsThreadDone')
 
+BATCH_PARALLEL = 4  # number of batch engine calls allowed in flight at once
+
+BATCH_SIZE = 25  # most texts handed to a service's run_batch() in one call
+
 FAILURE_CACHE_SECS = 3600  # ignore/dump failures from cache after one hour
 
 RE_MUSTACHE = re.compile(r'\{?\{\{(.+?)\}\}\}?')
@@ -75,18 +80,28 @@ class Router(object):
     class BusyError(RuntimeError):
         """Raised for requests for files that are already underway."""
 
+    class CancelledError(RuntimeError):
+        """Raised for prefetches that were cancelled before finishing."""
+
     __slots__ = [
+        '_async',      # number of service runs underway on the event loop
         '_busy',       # list of file paths that are in-progress
         '_cache_dir',  # path for writing cached media files
+        '_cancelled',  # set of paths whose prefetches have been cancelled
         '_config',     # user configuration (dict-like)
+        '_durations',  # index of clip durations, recorded as clips are made
         '_failures',   # lookup of file paths that raised exceptions
+        '_joiners',    # map of paths being prefetched to calls waiting on them
         '_logger',     # logger-like interface with debug(), info(), etc.
+        '_network',    # event loop HTTP client, for aborting prefetches
         '_pool',       # instance of the _Pool class for managing threads
+        '_prefetches',  # map of paths being prefetched to their tokens
         '_services',   # bundle with dead services, aliases, avail, lookup
         '_temp_dir',   # path for writing human-readable filenames
     ]
 
-    def __init__(self, services, cache_dir, temp_dir, logger, config):
+    def __init__(self, services, cache_dir, temp_dir, logger, config,
+                 durations, network):
         """
         The services should be a bundle with the following:
 
@@ -104,6 +119,12 @@ class Router(object):
         The logger object should have an interface like the one used by
         the standard library logging module, with debug(), info(), and
         so on, available.
+
+        The durations object is an index that the length of every newly
+        written clip gets recorded into.
+
+        The network object is the event loop HTTP client that services
+        with run_async() make their requests through.
         """
 
         services.aliases = {
@@ -122,12 +143,18 @@ class Router(object):
             for svc_id, svc_class in services.mappings
         }
 
+        self._async = 0
         self._busy = []
         self._cache_dir = cache_dir
+        self._cancelled = set()
         self._config = config
+        self._durations = durations
         self._failures = {}
+        self._joiners = {}
         self._logger = logger
+        self._network = network
         self._pool = _Pool(logger)
+        self._prefetches = {}
         self._services = services
         self._temp_dir = temp_dir
 
@@ -336,7 +363,7 @@ class Router(object):
             try_next()
 
     def __call__(self, svc_id, text, options, callbacks,
-                 want_human=False, note=None):
+                 want_human=False, note=None, prefetch=False):
         """
         Given the service ID and associated options, pass the text into
         the service for processing.
@@ -381,6 +408,12 @@ class Router(object):
         how the caller wants the filename in the path to be formatted.
         Additionally, note may be passed to provide mustache values for
         the given template string.
+
+        If prefetch is set, the call is only warming the cache for a
+        clip that may be wanted soon. Should a regular call for the same
+        clip come in while the prefetch is still underway, it waits for
+        the prefetch to finish rather than failing with a BusyError.
+        The prefetch value is also a token that cancel() accepts.
         """
 
         self._call_assert_callbacks(callbacks)
@@ -395,7 +428,7 @@ class Router(object):
             if not text:
                 raise ValueError("Text not usable by " + service['class'].NAME)
             path = self._validate_path(svc_id, text, options)
-            cache_hit = os.path.exists(path)
+            cache_hit = path not in self._joiners and os.path.exists(path)
 
             self._logger.debug(
                 "Parsed call to '%s' w/ %s and \"%s\" at %s (cache %s)",
@@ -493,7 +526,11 @@ class Router(object):
 
             return new_path
 
-        if cache_hit:
+        if path in self._joiners:
+            self._logger.debug("Waiting on prefetch of %s", path)
+            self._joiners[path].append((callbacks, human))
+
+        elif cache_hit:
             if 'done' in callbacks:
                 callbacks['done']()
             callbacks['okay'](human(path))
@@ -519,6 +556,7 @@ class Router(object):
                 """
 
                 if BaseTrait.INTERNET in service['class'].TRAITS and \
+                   not isinstance(exception, self.CancelledError) and \
                    not isinstance(exception, IncompleteRead) and \
                    not isinstance(exception, SocketError) and \
                    not isinstance(exception, URLError):
@@ -527,11 +565,27 @@ class Router(object):
 
             service['instance'].net_reset()
             self._busy.append(path)
+            if prefetch:
+                self._joiners[path] = []
+                self._prefetches[path] = prefetch
 
             def completion_callback(exception):
                 """Intermediate callback handler for all service calls."""
 
                 self._busy.remove(path)
+                joiners = self._joiners.pop(path, [])
+                self._prefetches.pop(path, None)
+
+                if path in self._cancelled:
+                    self._cancelled.remove(path)
+                    if exception:  # e.g. the URLError from an aborted reply
+                        exception = self.CancelledError("Prefetch cancelled")
+
+                if not exception and not os.path.exists(path):
+                    exception = RuntimeError(
+                        "The %s service did not successfully write out an "
+                        "MP3." % service['name']
+                    )
 
                 if 'done' in callbacks:
                     callbacks['done']()
@@ -541,46 +595,288 @@ class Router(object):
 
                 if exception:
                     on_error(exception)
-                elif os.path.exists(path):
-                    callbacks['okay'](human(path))
                 else:
-                    on_error(RuntimeError(
-                        "The %s service did not successfully write out an "
-                        "MP3." % service['name']
-                    ))
+                    callbacks['okay'](human(path))
 
                 if 'then' in callbacks:
                     callbacks['then']()
 
+                # regular calls that came in while this was a prefetch; ones
+                # that joined after it was cancelled go back through routing
+                for joiner, joiner_human in joiners:
+                    if isinstance(exception, self.CancelledError):
+                        self(svc_id, text, options, joiner, want_human, note)
+                        continue
+                    if 'done' in joiner:
+                        joiner['done']()
+                    if exception:
+                        joiner['fail'](exception)
+                    else:
+                        joiner['okay'](joiner_human(path))
+                    if 'then' in joiner:
+                        joiner['then']()
+
+            def validate():
+                """Checks what the service wrote out, if anything."""
+
+                if os.path.exists(path):  # else completion_callback() reports
+                    self._validate_output(path)
+
+            def run_validated():
+                """
+                Runs the service, releasing any temporary files it left
+                behind, then validates what it wrote.
+                """
+
+                if path in self._cancelled:
+                    raise self.CancelledError("Prefetch cancelled")
+                try:
+                    service['instance'].run(text, options, path)
+                finally:
+                    service['instance'].path_release()
+                validate()
+
+            def async_begin():
+                """Counts a stage of the call run on the event loop."""
+
+                self._async += 1
+
+            def async_end():
+                """
+                Uncounts a stage run on the event loop. The temporary
+                files handed out on the main thread are shared by all of
+                the runs there, so they are released once none remain.
+                """
+
+                self._async -= 1
+                if not self._async:
+                    service['instance'].path_release()
+
+            def async_okay():
+                """Validates what the service wrote, then completes."""
+
+                try:
+                    validate()
+                except ValueError as exception:
+                    async_fail(exception)
+                else:
+                    async_end()
+                    completion_callback(None)
+
+            def async_fail(exception):
+                """Completes a failed run from the event loop."""
+
+                async_end()
+                completion_callback(exception)
+
             def do_spawn():
-                """Call if ready to start a thread to run the service."""
-                self._pool.spawn(
-                    task=lambda: service['instance'].run(text, options, path),
-                    callback=completion_callback,
-                )
+                """
+                Call if ready to run the service, either directly on the
+                event loop (if it supports it) or in a worker thread.
+                """
+
+                if path in self._cancelled:
+                    completion_callback(self.CancelledError("Cancelled"))
+
+                elif hasattr(service['instance'], 'run_async'):
+                    async_begin()
+                    try:
+                        # n.b. requests are tagged w/ the path, for cancel()
+                        self._network.within(
+                            path,
+                            lambda: service['instance'].run_async(
+                                text, options, path,
+                                dict(okay=async_okay, fail=async_fail),
+                            ),
+                        )
+                    except Exception as exception:  # all, pylint:disable=W0703
+                        self._logger.error("Synchronous exception in "
+                                           "run_async: %s", exception)
+                        async_fail(exception)
+
+                else:
+                    self._pool.spawn(
+                        task=run_validated,
+                        callback=completion_callback,
+                    )
 
             if hasattr(service['instance'], 'prerun'):
                 def prerun_ok(result):
                     """Callback handler for successful prerun hook."""
                     options['prerun'] = result
                     do_spawn()
+                    async_end()
 
                 def prerun_error(exception):
                     """Callback handler for unsuccessful prerun hook."""
                     self._logger.error("Asynchronous exception in prerun: %s",
                                        exception)
-                    completion_callback(exception)
+                    async_fail(exception)
 
+                async_begin()
                 try:
                     service['instance'].prerun(text, options, path,
                                                prerun_ok, prerun_error)
                 except Exception as exception:  # all, pylint:disable=W0703
                     self._logger.error("Synchronous exception in prerun: %s",
                                        exception)
-                    completion_callback(exception)
+                    async_fail(exception)
             else:
                 do_spawn()
 
+    def cancel(self, token):
+        """
+        Cancels the prefetches that were made with the given token and
+        that no regular call is waiting on. One that has not reached its
+        service yet never runs it, and the in-flight requests of one
+        running on the event loop are aborted. A prefetch that a worker
+        thread is already running cannot be interrupted, so it finishes,
+        and its clip is kept.
+
+        Cancelled prefetches still complete through their callbacks,
+        failing with a CancelledError, which is not cached as a failure.
+        """
+
+        for path, prefetch in self._prefetches.items():
+            if prefetch == token and not self._joiners.get(path) and \
+                    path not in self._cancelled:
+                self._logger.debug("Cancelling prefetch of %s", path)
+                self._cancelled.add(path)
+                self._network.abort(path)
+
+    def batch(self, svc_id, texts, options, callbacks):
+        """
+        Warms the cache for a list of texts that are all to be run with
+        the same service ID and options, for services that implement a
+        run_batch(texts, options, paths) hook (e.g. local engines that
+        can synthesize many utterances in one go). Texts whose clips are
+        already cached or underway are skipped, and the cache misses are
+        handed to run_batch() in groups of up to BATCH_SIZE.
+
+        This is purely an optimization: afterward, the caller should go
+        on to make its usual calls, which will then hit the cache. If a
+        clip could not be written in a batch, its usual call will run
+        the service for it alone and report any error as normal. It is
+        safe to call for services without run_batch(); nothing is done.
+        Use can_batch() to find out beforehand whether it would be.
+
+        The callbacks parameter is a dict and contains the following:
+
+            - 'okay' (required): called with the number of clips written
+            - 'fail' (required): called with an exception if the batch
+               could not be run at all (e.g. an invalid service)
+            - 'progress' (optional): called after each group finishes
+               with the number of texts handled so far and the total
+            - 'stop' (optional): called before each group is started;
+               if it returns True, no further groups are started
+        """
+
+        assert 'okay' in callbacks and callable(callbacks['okay'])
+        assert 'fail' in callbacks and callable(callbacks['fail'])
+
+        try:
+            svc_id, service, options = self._validate_service(svc_id, options)
+            instance = service['instance']
+
+            paths = []
+            pending = {}
+            if hasattr(instance, 'run_batch'):
+                for text in texts:
+                    text = text and instance.modify(text)
+                    if not text:
+                        continue
+                    path = self._path_cache(svc_id, text, options)
+                    if path not in pending and path not in self._busy \
+                            and not os.path.exists(path):
+                        paths.append(path)
+                        pending[path] = text
+
+        except Exception as exception:  # catch all, pylint:disable=W0703
+            callbacks['fail'](exception)
+            return
+
+        chunks = [paths[i:i + BATCH_SIZE]
+                  for i in range(0, len(paths), BATCH_SIZE)]
+        state = dict(finished=0, running=0, written=0)
+
+        self._logger.debug("Batching %d of %d texts for '%s' in %d call(s)",
+                           len(paths), len(texts), svc_id, len(chunks))
+        self._busy.extend(paths)
+
+        def run_chunk(chunk):
+            """Runs the service on a group, then checks each output."""
+
+            try:
+                instance.run_batch([pending[path] for path in chunk],
+                                   options, chunk)
+            finally:
+                instance.path_release()
+
+            for path in chunk:
+                if os.path.exists(path):
+                    try:
+                        self._validate_output(path)
+                    except ValueError as exception:
+                        self._logger.warn("Batched clip for \"%s\" was "
+                                          "unusable: %s",
+                                          pending[path], exception)
+
+        def on_chunk(chunk, exception):
+            """Tallies a finished group, then moves on to the next."""
+
+            for path in chunk:
+                self._busy.remove(path)
+
+            if exception:
+                self._logger.warn("Batch of %d for '%s' failed: %s",
+                                  len(chunk), svc_id, exception)
+
+            state['running'] -= 1
+            state['finished'] += len(chunk)
+            state['written'] += sum(os.path.exists(path) for path in chunk)
+            if 'progress' in callbacks:
+                callbacks['progress'](state['finished'], len(paths))
+            spawn_next()
+
+        def spawn_next():
+            """Keeps up to BATCH_PARALLEL groups running until done."""
+
+            if chunks and 'stop' in callbacks and callbacks['stop']():
+                self._logger.debug("Stopping batch for '%s' with %d "
+                                   "group(s) left", svc_id, len(chunks))
+                for chunk in chunks:
+                    for path in chunk:
+                        self._busy.remove(path)
+                del chunks[:]
+
+            while chunks and state['running'] < BATCH_PARALLEL:
+                chunk = chunks.pop(0)
+                state['running'] += 1
+                self._pool.spawn(
+                    task=lambda chunk=chunk: run_chunk(chunk),
+                    callback=lambda exception, chunk=chunk:
+                    on_chunk(chunk, exception),
+                )
+
+            if not state['running']:
+                callbacks['okay'](state['written'])
+
+        spawn_next()
+
+    def can_batch(self, svc_id):
+        """
+        Returns True if the service (given by its ID or alias) runs
+        groups of texts for batch(), or False if it does not, or if it
+        does not exist or is not available.
+        """
+
+        try:
+            _, service = self._fetch_service(svc_id)
+        except (EnvironmentError, ValueError):
+            return False
+
+        return hasattr(service['instance'], 'run_batch')
+
     def _call_assert_callbacks(self, callbacks):
         """Checks the callbacks argument for validity."""
 
@@ -688,15 +984,31 @@ class Router(object):
 
         return problems
 
+    def _validate_output(self, path):
+        """
+        Checks that the service wrote out a sound MP3 at the path and
+        records its duration, removing it and raising ValueError if not
+        so, so that a bad download never stays cached.
+        """
+
+        try:
+            self._durations.record(path, validate_mp3(path))
+        except ValueError:
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+            raise
+
     def _validate_path(self, svc_id, text, options):
         """
         Given the service ID, its associated options, and the desired
         text, generate a cache path. If the file is already being
-        processed, raise a BusyError.
+        processed, raise a BusyError, unless it is being prefetched.
         """
 
         path = self._path_cache(svc_id, text, options)
-        if path in self._busy:
+        if path in self._busy and path not in self._joiners:
             raise self.BusyError(
                 "The '%s' service is already busy processing %s." %
                 (svc_id, path)
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+
+# AwesomeTTS text-to-speech add-on for Anki
+#
+# Copyright (C) 2016       Anki AwesomeTTS Development Team
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Scratch space for intermediate files
+"""
+
+from itertools import count
+import os
+from os.path import isdir, join
+import sys
+from threading import local
+from time import time
+
+__all__ = ['Scratch']
+
+
+class Scratch(object):
+    """
+    Hands out paths for intermediate files (e.g. WAVs waiting to be
+    transcoded) within a directory for this session. Where a RAM-backed
+    directory is available (i.e. /dev/shm on Linux), it is used while it
+    has room to spare, so that those files never have to touch a disk.
+
+    Paths are named using a counter, and each one is tracked against
+    the thread that asked for it, so that once that thread's work is
+    over, release() can remove whatever is left, even if the work
+    failed partway through.
+    """
+
+    __slots__ = [
+        '_bases',    # list of directories holding scratch dirs to sweep
+        '_counter',  # source of unique numbers for naming files
+        '_dirs',     # list of scratch dirs to use, in order of preference
+        '_local',    # thread-local storage, tracking paths handed out
+        '_logger',   # logger-like interface with debug(), info(), etc.
+    ]
+
+    PREFIX = '_awesometts_scratch'
+
+    # RAM-backed directory to prefer, if it exists and is writable
+    RAM_BASE = '/dev/shm'
+
+    # RAM-backed directory is passed over if it has less free space
+    RAM_MIN_FREE = 64 * 1024 * 1024
+
+    # another process's scratch dir is only swept once it is this stale
+    STALE_SECS = 86400
+
+    def __init__(self, disk_base, logger):
+        """
+        Initialize with a directory on disk to fall back to (e.g. the
+        system's temporary directory) and a logger.
+        """
+
+        name = '%s_%d_%d' % (self.PREFIX, int(time()), os.getpid())
+
+        self._bases = [disk_base]
+        self._counter = count(1)
+        self._dirs = [join(disk_base, name)]
+        self._local = local()
+        self._logger = logger
+
+        if sys.platform.startswith('linux') and isdir(self.RAM_BASE) and \
+                os.access(self.RAM_BASE, os.W_OK):
+            self._bases.append(self.RAM_BASE)
+            self._dirs.insert(0, join(self.RAM_BASE, name))
+
+    def path(self, extension):
+        """
+        Returns a new path using the given extension that may be used
+        for writing out a temporary file.
+        """
+
+        directory = next(directory for directory in self._dirs
+                         if directory == self._dirs[-1] or
+                         self._has_room(directory))
+        if not isdir(directory):
+            try:
+                os.makedirs(directory)
+            except OSError:  # n.b. another thread may have just made it
+                if not isdir(directory):
+                    raise
+
+        path = join(directory, '%d.%s' % (next(self._counter), extension))
+
+        try:
+            self._local.paths.append(path)
+        except AttributeError:
+            self._local.paths = [path]
+
+        return path
+
+    def release(self):
+        """
+        Removes any files still present at the paths that were handed
+        out to the current thread.
+        """
+
+        paths = getattr(self._local, 'paths', None)
+        self._local.paths = []
+
+        for path in paths or []:
+            if os.path.exists(path):
+                try:
+                    os.unlink(path)
+                    self._logger.debug("Released %s from scratch space", path)
+                except OSError:
+                    self._logger.warn("Unable to release %s", path)
+
+    def sweep(self):
+        """
+        Removes the scratch directories (and their files) of this
+        process, i.e. those named with its PID, and those left behind by
+        earlier sessions that have not been touched in STALE_SECS. The
+        directories of another session that is still running (e.g. a
+        second copy of Anki) are left alone.
+        """
+
+        suffix = '_%d' % os.getpid()
+        stale = time() - self.STALE_SECS
+
+        for base in self._bases:
+            try:
+                subdirs = [join(base, filename)
+                           for filename in os.listdir(base)
+                           if filename.startswith(self.PREFIX)]
+            except OSError:
+                continue
+
+            for subdir in subdirs:
+                try:
+                    if not isdir(subdir) or (
+                            not subdir.endswith(suffix) and
+                            os.path.getmtime(subdir) > stale
+                    ):
+                        continue
+                except OSError:
+                    continue
+
+                for filename in os.listdir(subdir):
+                    try:
+                        os.unlink(join(subdir, filename))
+                    except OSError:  # skip busy files
+                        pass
+
+                try:
+                    os.rmdir(subdir)
+                except OSError:
+                    pass
+
+    def _has_room(self, directory):
+        """Returns True if the file system has RAM_MIN_FREE to spare."""
+
+        try:
+            stat = os.statvfs(os.path.dirname(directory))
+        except (AttributeError, OSError):
+            return False
+
+        return stat.f_bavail * stat.f_frsize >= self.RAM_MIN_FREE
@@ -90,24 +90,28 @@ class Abair(Service):
             raise IOError("abair.ie only supports input up to %d characters." %
                           TEXT_LENGTH_LIMIT)
 
-        payload = self.net_stream(
-            (
-                FORM_ENDPOINT,
-                dict(
-                    input=text,
-                    speed=options['speed'],
-                    synth=options['voice'],
-                ),
+        target = (
+            FORM_ENDPOINT,
+            dict(
+                input=text,
+                speed=options['speed'],
+                synth=options['voice'],
             ),
-            method='POST',
         )
+        payload = self.net_stream(target, method='POST',
+                                  cache_secs=self.CACHE_SECS_EPHEMERAL)
 
         match = RE_FILENAME.search(payload)
         if not match:
             raise IOError("Cannot find sound file in response from abair.ie")
 
-        self.net_download(
-            path,
-            AUDIO_URL % match.group(1),
-            require=REQUIRE_MP3,
-        )
+        try:
+            self.net_download(
+                path,
+                AUDIO_URL % match.group(1),
+                require=REQUIRE_MP3,
+            )
+        except Exception:
+            # n.b. the sound file named on a cached page may be gone by now
+            self.net_uncache(target, method='POST')
+            raise
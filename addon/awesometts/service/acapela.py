@@ -150,21 +150,25 @@ class Acapela(Service):
             the given subpath.
             """
 
-            payload = self.net_stream(
-                (
-                    FORM_ENDPOINT,
-                    dict(
-                        MySelectedVoice=long_voice_name,
-                        MyTextForTTS=subtext,
-                        SendToVaaS='',
-                        t=1,
-                    ),
+            target = (
+                FORM_ENDPOINT,
+                dict(
+                    MySelectedVoice=long_voice_name,
+                    MyTextForTTS=subtext,
+                    SendToVaaS='',
+                    t=1,
                 ),
-                method='POST',
             )
-            match = RE_MP3.search(payload)
-            match = match.group(0)
-            self.net_download(subpath, match, require=REQUIRE_MP3)
+            payload = self.net_stream(target, method='POST',
+                                      cache_secs=self.CACHE_SECS_EPHEMERAL)
+            try:
+                match = RE_MP3.search(payload)
+                match = match.group(0)
+                self.net_download(subpath, match, require=REQUIRE_MP3)
+            except Exception:
+                # n.b. the MP3 URL on a cached page may have expired
+                self.net_uncache(target, method='POST')
+                raise
 
         subtexts = self.util_split(text, 300)  # see `maxlength` on site
         if len(subtexts) == 1:
@@ -38,6 +38,8 @@ VOICES = {
     'zh': "Chinese",
 }
 
+REQUIRE_MP3 = dict(mime='audio/mp3', size=512)
+
 
 class Baidu(Service):
     """
@@ -72,12 +74,20 @@ class Baidu(Service):
     def run(self, text, options, path):
         """Downloads from Baidu directly to an MP3."""
 
-        self.net_download(
-            path,
-            [
-                ('http://tts.baidu.com/text2audio',
-                 dict(text=subtext, lan=options['voice'], ie='UTF-8'))
-                for subtext in self.util_split(text, 300)
-            ],
-            require=dict(mime='audio/mp3', size=512),
-        )
+        self.net_download(path, self._targets(text, options),
+                          require=REQUIRE_MP3)
+
+    def run_async(self, text, options, path, callbacks):
+        """Downloads from Baidu directly to an MP3 on the event loop."""
+
+        self.net_download_async(path, self._targets(text, options),
+                                callbacks, require=REQUIRE_MP3)
+
+    def _targets(self, text, options):
+        """Returns the list of targets to download the text from."""
+
+        return [
+            ('http://tts.baidu.com/text2audio',
+             dict(text=subtext, lan=options['voice'], ie='UTF-8'))
+            for subtext in self.util_split(text, 300)
+        ]
@@ -59,6 +59,19 @@ class Service(object):
     cached). The run() method will usually only be called one time for a
     particular set of arguments (because the media files it produces are
     retained on the file system).
+
+    Concrete classes whose run() only needs to make web requests may
+    also implement run_async(text, options, path, callbacks), using the
+    net_xxx_async() helpers. If present, the framework calls it on the
+    main thread instead of giving run() a thread of its own, and the
+    implementation must call callbacks['okay']() once the file at path
+    has been written or callbacks['fail'](exception) otherwise.
+
+    Concrete classes that can synthesize many texts in one engine call
+    may also implement run_batch(texts, options, paths), writing each
+    text's clip to the path at the same index. The framework calls it
+    on a worker thread to warm the cache ahead of a run of ordinary
+    calls; a clip it does not write is left for run() to produce.
     """
 
     __metaclass__ = abc.ABCMeta
@@ -67,14 +80,24 @@ class Service(object):
         """Raises when a download is too small."""
 
     __slots__ = [
-        '_netops',      # number of network ops required by the last run
-        '_lame_flags',  # callable to get flag string for LAME transcoder
-        '_logger',      # logging interface with debug(), info(), etc.
-        'normalize',    # callable for standardizing string values
-        '_temp_dir',    # for temporary scratch space
-        'ecosystem',    # get information about web API, user agent
+        '_netops',         # number of network ops required by the last run
+        '_lame_flags',     # callable to get flag string for LAME transcoder
+        '_logger',         # logging interface with debug(), info(), etc.
+        '_network',        # event loop-driven HTTP client for net_xxx_async()
+        'normalize',       # callable for standardizing string values
+        '_responses_dir',  # for cached intermediate web responses
+        '_scratch',        # hands out and releases temporary file paths
+        '_transcoder',     # shared stage that runs the LAME transcoding jobs
+        '_trim_silence',   # callable to get whether to trim edge silence
+        'ecosystem',       # get information about web API, user agent
     ]
 
+    # for net_stream() cache_secs, e.g. for pages w/ short-lived MP3 URLs
+    CACHE_SECS_EPHEMERAL = 600
+
+    # for net_stream() cache_secs, e.g. for dictionary entry pages
+    CACHE_SECS_STABLE = 86400 * 7
+
     # when getting CLI output, try using these decodings, in this order
     CLI_DECODINGS = ['ascii', 'utf-8', 'latin-1']
 
@@ -132,7 +155,8 @@ class Service(object):
     # e.g. TRAITS = [Trait.INTERNET, Trait.TRANSCODING]
     TRAITS = None
 
-    def __init__(self, temp_dir, lame_flags, normalize, logger, ecosystem):
+    def __init__(self, scratch, lame_flags, normalize, logger, ecosystem,
+                 network, responses_dir, transcoder, trim_silence):
         """
         Attempt to initialize the service, raising a exception if the
         service cannot be used. If the service needs to make any calls
@@ -143,9 +167,10 @@ class Service(object):
         list of services or the first time the framework encounters an
         on-the-fly TTS tag for the service.
 
-        The temp_dir will be used as the base for paths that are needed
-        only temporarily (e.g. temporary input files to feed services,
-        temporary audio files that need to be transcoded to MP3).
+        The scratch object hands out the paths that are needed only
+        temporarily (e.g. temporary input files to feed services,
+        temporary audio files that need to be transcoded to MP3), and
+        removes any left over once the router is done with a run.
 
         The lame_flags is a callable to retrieve a string of flags to be
         passed to LAME transcoder if the service needs to transcode
@@ -154,6 +179,18 @@ class Service(object):
         The logger object should have an interface like the one used by
         the standard library logging module, with debug(), info(), and
         so on, available.
+
+        The network object is the shared event loop-driven HTTP client
+        that the net_xxx_async() helpers use.
+
+        The responses_dir is where net_stream() keeps web responses that
+        a call site has asked to be cached (see cache_secs).
+
+        The transcoder object is the shared stage whose worker threads
+        run every service's LAME jobs (see cli_transcode()).
+
+        The trim_silence is a callable to retrieve whether the silence
+        at the edges of WAV audio should be trimmed before transcoding.
         """
 
         assert self.NAME, "Please specify a NAME for the service"
@@ -163,8 +200,12 @@ class Service(object):
         self._netops = None
         self._lame_flags = lame_flags
         self._logger = logger
+        self._network = network
         self.normalize = normalize
-        self._temp_dir = temp_dir
+        self._responses_dir = responses_dir
+        self._scratch = scratch
+        self._transcoder = transcoder
+        self._trim_silence = trim_silence
         self.ecosystem = ecosystem
 
     @abc.abstractmethod
@@ -369,6 +410,15 @@ class Service(object):
         If add_padding is True, then some additional null padding will
         be added onto the resulting MP3. This can be helpful to ensure
         that the generated MP3 will not be clipped by `mplayer`.
+
+        The LAME call itself is queued onto the shared transcoder, so
+        the number of concurrent LAME processes is capped at the number
+        of CPU cores, no matter how many services are running.
+
+        If the input is a WAV file, its header is checked and it must
+        have a minimum duration of audio before LAME is called. If the
+        user has enabled it, silence at the edges of the WAV is trimmed
+        (into another temporary file) as part of the transcoding job.
         """
 
         if not os.path.exists(input_path):
@@ -387,38 +437,252 @@ class Service(object):
                 )
             )
 
+        if input_path.lower().endswith('.wav'):
+            from ..audio import validate_wav
+            try:
+                validate_wav(input_path)
+            except ValueError as value_error:
+                raise ValueError("Input to transcoder was unusable: %s (the "
+                                 "service might not have liked your input "
+                                 "text)" % value_error)
+
         intermediate_path = self.path_temp('mp3')  # see note above
+        trimmed_path = (self.path_temp('wav')
+                        if (input_path.lower().endswith('.wav') and
+                            self._trim_silence())
+                        else None)
+
+        def transcode():
+            """Trims the input if enabled, then runs LAME on it."""
+
+            source_path = input_path
+            if trimmed_path:
+                from ..audio import trim_wav
+                if trim_wav(input_path, trimmed_path):
+                    source_path = trimmed_path
 
-        try:
             self.cli_call(
                 self.CLI_LAME,
                 self._lame_flags().split(),
-                input_path,
+                source_path,
                 intermediate_path,
             )
 
+        try:
+            self._transcoder.run(transcode, input_path)
+
         except OSError as os_error:
-            from errno import ENOENT
-            if os_error.errno == ENOENT:
-                raise OSError(
-                    ENOENT,
-                    "Unable to find lame to transcode the audio. "
-                    "It might not have been installed.",
-                )
-            else:
-                raise
+            raise self._cli_lame_error(os_error)
+
+        finally:
+            if trimmed_path and os.path.exists(trimmed_path):
+                self.path_unlink(trimmed_path)
 
         if not os.path.exists(intermediate_path):
-            raise RuntimeError(
-                "Transcoding the audio stream failed. Are the flags you "
-                "specified for LAME (%s) okay?" % self._lame_flags()
-            )
+            raise self._cli_lame_error()
 
         if add_padding:
             self.util_pad(intermediate_path)
 
         shutil.move(intermediate_path, output_path)  # see note above
 
+    def cli_transcode_pipe(self, args, output_path, require=None,
+                           add_padding=False, input_path=None):
+        """
+        Like cli_transcode(), but for a service binary that can write
+        its audio to stdout. The binary's stdout is piped straight into
+        LAME's stdin, and LAME's stdout is written out to output_path,
+        so the only file written to disk is the MP3 itself. The args
+        may be nested lists, as with cli_call().
+
+        If given, the input path is passed to the binary as its stdin
+        (e.g. for a binary that reads the text to speak from stdin).
+
+        As with cli_transcode(), the require dict may have a 'size_in'
+        key. LAME is not started until the binary has written at least
+        that many bytes and the head of the stream has been checked to
+        be a WAV header, so a binary that yields too little or unusable
+        audio fails the same way and nothing is left behind. Trimming
+        silence, if enabled, happens on the stream on its way to LAME.
+        """
+
+        import threading
+        from ..audio import parse_wav_header, sized_wav_header, SilenceTrimmer
+
+        args = [arg if isinstance(arg, basestring) else str(arg)
+                for arg in self._flatten(args)]
+        size_in = require.get('size_in', 0) if require else 0
+
+        self._logger.debug("Piping %s binary with %s into %s then onto %s",
+                           args[0],
+                           args[1:] if len(args) > 1 else "no arguments",
+                           self.CLI_LAME, output_path)
+
+        # n.b. written next to output_path and then renamed, so that a
+        # failed or interrupted transcode is never mistaken for a clip
+        partial_path = output_path + '.part'
+
+        input_stream = open(input_path, 'rb') if input_path else None
+        processes = []
+        succeeded = False
+
+        try:
+            engine = subprocess.Popen(args, stdin=input_stream,
+                                      stdout=subprocess.PIPE,
+                                      startupinfo=self.CLI_SI)
+            processes.append(engine)
+
+            head = []
+            head_size = 0
+            while head_size < max(size_in, 4096):
+                chunk = engine.stdout.read(4096)
+                if not chunk:
+                    break
+                head.append(chunk)
+                head_size += len(chunk)
+
+            if head_size < size_in:
+                engine.stdout.close()
+                engine.wait()
+                if engine.returncode:
+                    raise subprocess.CalledProcessError(engine.returncode,
+                                                        args)
+                raise ValueError(
+                    "Input to transcoder was %d-byte stream; wanted %d+ "
+                    "bytes (the service might not have liked your input "
+                    "text)" % (head_size, size_in)
+                )
+
+            head = ''.join(head)
+            try:
+                header = parse_wav_header(head)
+            except ValueError as value_error:
+                raise ValueError("Input to transcoder was unusable: %s (the "
+                                 "service might not have liked your input "
+                                 "text)" % value_error)
+
+            def chunks():
+                """Yields the engine's stream, trimmed if enabled."""
+
+                if self._trim_silence() and \
+                        header.format in (1, 0xFFFE) and \
+                        header.bits in SilenceTrimmer.SUPPORTED_BITS:
+                    trimmer = SilenceTrimmer(header.channels,
+                                             header.sample_rate, header.bits)
+
+                    # n.b. LAME takes the sizes in the header at their word,
+                    # but the trimmed size is only known at the end of the
+                    # stream, so the samples are held in memory until then
+                    data = [trimmer.feed(head[header.data_offset:])]
+                    for chunk in iter(lambda: engine.stdout.read(4096), ''):
+                        data.append(trimmer.feed(chunk))
+                    data.append(trimmer.finish())
+
+                    yield sized_wav_header(head, header,
+                                           sum(len(part) for part in data))
+                    for part in data:
+                        yield part
+
+                else:
+                    yield head
+                    for chunk in iter(lambda: engine.stdout.read(4096), ''):
+                        yield chunk
+
+            def encode():
+                """Feeds the engine's stream through LAME to the file."""
+
+                with open(partial_path, 'wb') as output_stream:
+                    try:
+                        lame = subprocess.Popen(
+                            [self.CLI_LAME] + self._lame_flags().split() +
+                            ['-', '-'],
+                            stdin=subprocess.PIPE,
+                            stdout=subprocess.PIPE,
+                            startupinfo=self.CLI_SI,
+                        )
+                    except OSError as os_error:
+                        raise self._cli_lame_error(os_error)
+                    processes.append(lame)
+
+                    # n.b. LAME's output must be drained while its input is
+                    # still being fed to it, otherwise both pipes can fill
+                    def drain():
+                        """Copies LAME's stdout into the output file."""
+
+                        for chunk in iter(lambda: lame.stdout.read(4096),
+                                          ''):
+                            output_stream.write(chunk)
+
+                    drainer = threading.Thread(target=drain)
+                    drainer.start()
+
+                    try:
+                        for chunk in chunks():
+                            lame.stdin.write(chunk)
+                    except IOError:  # LAME quit early; exit code says why
+                        engine.stdout.close()
+                    finally:
+                        lame.stdin.close()
+                        drainer.join()
+
+                    lame.wait()
+                    engine.wait()
+
+                    if lame.returncode or not output_stream.tell():
+                        raise self._cli_lame_error()
+                    if engine.returncode:
+                        raise subprocess.CalledProcessError(
+                            engine.returncode,
+                            args,
+                        )
+
+                    if add_padding:
+                        output_stream.write(PADDING)
+
+            # n.b. the engine is left blocked on its full stdout pipe until
+            # the transcoder has a free worker to take on the encoding
+            self._transcoder.run(encode, args[0])
+
+            shutil.move(partial_path, output_path)
+            succeeded = True
+
+        finally:
+            if input_stream:
+                input_stream.close()
+
+            if not succeeded:
+                for process in processes:
+                    if process.poll() is None:
+                        try:
+                            process.kill()
+                        except OSError:
+                            pass
+                if os.path.exists(partial_path):
+                    self.path_unlink(partial_path)
+
+    def _cli_lame_error(self, os_error=None):
+        """
+        Returns an exception explaining why LAME could not be used,
+        given the OSError from trying to start it (if there was one).
+        """
+
+        from errno import ENOENT
+
+        if not os_error:
+            return RuntimeError(
+                "Transcoding the audio stream failed. Are the flags you "
+                "specified for LAME (%s) okay?" % self._lame_flags()
+            )
+
+        elif os_error.errno == ENOENT:
+            return OSError(
+                ENOENT,
+                "Unable to find lame to transcode the audio. "
+                "It might not have been installed.",
+            )
+
+        return os_error
+
     def _cli_exec(self, callee, args, purpose, redirect_stderr=False):
         """
         Handles the underlying system call, logging, and exceptions when
@@ -494,9 +758,25 @@ class Service(object):
             timeout=DEFAULT_TIMEOUT,
         ).headers
 
+    def net_headers_async(self, url, callbacks):
+        """
+        Like net_headers(), but returns immediately, passing the headers
+        to callbacks['okay'] once they arrive. See net_stream_async().
+        """
+
+        self._logger.debug("GET %s for headers on event loop", url)
+        self._netops += 1
+
+        self._network.request(
+            url,
+            dict(okay=lambda response: callbacks['okay'](response.headers),
+                 fail=callbacks['fail']),
+            headers={'User-Agent': DEFAULT_UA},
+        )
+
     def net_stream(self, targets, require=None, method='GET',
                    awesome_ua=False, add_padding=False,
-                   custom_quoter=None, custom_headers=None):
+                   custom_quoter=None, custom_headers=None, cache_secs=None):
         """
         Returns the raw payload string from the specified target(s).
         If multiple targets are specified, their resulting payloads are
@@ -517,52 +797,43 @@ class Service(object):
         If add_padding is True, then some additional null padding will
         be added onto the stream returned. This is helpful for some web
         services that sometimes return MP3s that `mplayer` clips early.
+
+        If cache_secs is given, each successful response is stored on
+        disk for that many seconds, keyed by the method, address, query
+        string, and headers, and a fresh stored response is used instead
+        of making the request again. This is meant for intermediate pages
+        (e.g. a search result that points to the audio), not for the
+        audio itself, which the router already caches. Call sites that
+        find a URL on the page that might have expired should use
+        net_uncache() if retrieving it fails.
         """
 
         assert method in ['GET', 'POST'], "method must be GET or POST"
-        from urllib2 import urlopen, Request, quote
-
-        targets = targets if isinstance(targets, list) else [targets]
-        targets = [
-            (target, None) if isinstance(target, basestring)
-            else (
-                target[0],
-                '&'.join(
-                    '='.join([
-                        key,
-                        (
-                            custom_quoter[key] if (custom_quoter and
-                                                   key in custom_quoter)
-                            else quote
-                        )(
-                            val.encode('utf-8') if isinstance(val, unicode)
-                            else val if isinstance(val, str)
-                            else str(val),
-                            safe='',
-                        ),
-                    ])
-                    for key, val in target[1].items()
-                ),
-            )
-            for target in targets
-        ]
+        from urllib2 import urlopen, Request
 
+        targets = self._net_targets(targets, custom_quoter)
+        headers = self._net_headers(awesome_ua, custom_headers)
         require = require or {}
 
         payloads = []
 
         for number, (url, params) in enumerate(targets, 1):
-            desc = "web request" if len(targets) == 1 \
-                else "web request (%d of %d)" % (number, len(targets))
+            desc = self._net_desc(number, len(targets))
+
+            cache_path = (self._net_cache_path(method, url, params, headers)
+                          if cache_secs else None)
+            if cache_path:
+                payload = self._net_cache_get(cache_path)
+                if payload is not None:
+                    self._logger.debug("Using cached response for %s %s%s%s",
+                                       method, url, "?" if params else "",
+                                       params or "")
+                    payloads.append(payload)
+                    continue
 
             self._logger.debug("%s %s%s%s for %s", method, url,
                                "?" if params else "", params or "", desc)
 
-            headers = {'User-Agent': (self.ecosystem.agent
-                                      if awesome_ua else DEFAULT_UA)}
-            if custom_headers:
-                headers.update(custom_headers)
-
             self._netops += 1
             response = urlopen(
                 Request(
@@ -578,43 +849,278 @@ class Service(object):
                 raise IOError("No response for %s" % desc)
 
             if response.getcode() != 200:
-                value_error = ValueError(
-                    "Got %d status for %s" %
-                    (response.getcode(), desc)
-                )
+                payload = None
                 try:
-                    value_error.payload = response.read()
+                    payload = response.read()
                     response.close()
                 except StandardError:
                     pass
-                raise value_error
-
-            if 'mime' in require and \
-                    require['mime'] != format(response.info().
-                                              gettype()).replace('/x-', '/'):
-                value_error = ValueError(
-                    "Request got %s Content-Type for %s; wanted %s" %
-                    (response.info().gettype(), desc, require['mime'])
-                )
-                value_error.got_mime = response.info().gettype()
-                value_error.wanted_mime = require['mime']
-                raise value_error
+                raise self._net_status_error(desc, response.getcode(),
+                                             payload)
+
+            self._net_check_mime(desc, require, response.info().gettype())
 
             payload = response.read()
             response.close()
 
-            if 'size' in require and len(payload) < require['size']:
-                raise self.TinyDownloadError(
-                    "Request got %d-byte stream for %s; wanted %d+ bytes" %
-                    (len(payload), desc, require['size'])
-                )
-
+            self._net_check_size(desc, require, payload)
             payloads.append(payload)
 
+            if cache_path:
+                self._net_cache_put(cache_path, payload, cache_secs)
+
         if add_padding:
             payloads.append(PADDING)
         return ''.join(payloads)
 
+    def net_stream_async(self, targets, callbacks, require=None,
+                         method='GET', awesome_ua=False, add_padding=False,
+                         custom_quoter=None, custom_headers=None,
+                         cache_secs=None):
+        """
+        Like net_stream(), but returns immediately instead of blocking.
+        The request(s) run on the main thread's event loop, so this must
+        also be called from the main thread (e.g. from run_async()).
+
+        The callbacks parameter is a dict containing:
+
+            - 'okay' (required): called with the glued-together payload
+              once all targets have been retrieved
+            - 'fail' (required): called with an exception if any of the
+              requests fail or do not satisfy the require dict
+
+        All other arguments have the same meaning as for net_stream().
+        """
+
+        assert method in ['GET', 'POST'], "method must be GET or POST"
+        assert 'okay' in callbacks and callable(callbacks['okay'])
+        assert 'fail' in callbacks and callable(callbacks['fail'])
+
+        targets = self._net_targets(targets, custom_quoter)
+        headers = self._net_headers(awesome_ua, custom_headers)
+        require = require or {}
+
+        payloads = []
+
+        def fetch(number):
+            """Request the given target, or finish if none remain."""
+
+            if number > len(targets):
+                if add_padding:
+                    payloads.append(PADDING)
+                callbacks['okay'](''.join(payloads))
+                return
+
+            url, params = targets[number - 1]
+            desc = self._net_desc(number, len(targets))
+
+            cache_path = (self._net_cache_path(method, url, params, headers)
+                          if cache_secs else None)
+            if cache_path:
+                payload = self._net_cache_get(cache_path)
+                if payload is not None:
+                    self._logger.debug("Using cached response for %s %s%s%s",
+                                       method, url, "?" if params else "",
+                                       params or "")
+                    payloads.append(payload)
+                    fetch(number + 1)
+                    return
+
+            self._logger.debug("%s %s%s%s for %s on event loop", method, url,
+                               "?" if params else "", params or "", desc)
+
+            def on_okay(response):
+                """Check the response, then move onto the next target."""
+
+                try:
+                    if response.code != 200:
+                        raise self._net_status_error(desc, response.code,
+                                                     response.payload)
+                    self._net_check_mime(desc, require, response.mime)
+                    self._net_check_size(desc, require, response.payload)
+
+                except Exception as exception:  # all, pylint:disable=W0703
+                    callbacks['fail'](exception)
+
+                else:
+                    payloads.append(response.payload)
+                    if cache_path:
+                        self._net_cache_put(cache_path, response.payload,
+                                            cache_secs)
+                    fetch(number + 1)
+
+            self._netops += 1
+            self._network.request(
+                url=('?'.join([url, params]) if params and method == 'GET'
+                     else url),
+                callbacks=dict(okay=on_okay, fail=callbacks['fail']),
+                method='POST' if params and method == 'POST' else 'GET',
+                data=params if params and method == 'POST' else None,
+                headers=headers,
+            )
+
+        fetch(1)
+
+    def _net_targets(self, targets, custom_quoter=None):
+        """
+        Given one target or a list of them, returns a list of tuples,
+        each with an address and an encoded query string (or None).
+        """
+
+        from urllib2 import quote
+
+        targets = targets if isinstance(targets, list) else [targets]
+        return [
+            (target, None) if isinstance(target, basestring)
+            else (
+                target[0],
+                '&'.join(
+                    '='.join([
+                        key,
+                        (
+                            custom_quoter[key] if (custom_quoter and
+                                                   key in custom_quoter)
+                            else quote
+                        )(
+                            val.encode('utf-8') if isinstance(val, unicode)
+                            else val if isinstance(val, str)
+                            else str(val),
+                            safe='',
+                        ),
+                    ])
+                    for key, val in target[1].items()
+                ),
+            )
+            for target in targets
+        ]
+
+    def net_uncache(self, targets, method='GET', awesome_ua=False,
+                    custom_quoter=None, custom_headers=None):
+        """
+        Removes any stored responses for the given target(s), e.g. when
+        the audio URL found on a cached page turns out to have expired.
+        The arguments have the same meaning as they do for net_stream().
+        """
+
+        headers = self._net_headers(awesome_ua, custom_headers)
+
+        for url, params in self._net_targets(targets, custom_quoter):
+            path = self._net_cache_path(method, url, params, headers)
+            if os.path.exists(path):
+                self._logger.debug("Evicting cached response for %s %s%s%s",
+                                   method, url, "?" if params else "",
+                                   params or "")
+                self.path_unlink(path)
+
+    def _net_cache_path(self, method, url, params, headers):
+        """Returns the response cache path for the given request."""
+
+        from hashlib import sha1
+
+        key = '\n'.join([method, url, params or ''] +
+                        ['%s: %s' % header
+                         for header in sorted(headers.items())])
+        if isinstance(key, unicode):
+            key = key.encode('utf-8')
+        return os.path.join(self._responses_dir, sha1(key).hexdigest())
+
+    def _net_cache_get(self, path):
+        """
+        Returns the payload stored at the given response cache path, or
+        None if there is not one or it has expired.
+        """
+
+        from time import time
+
+        try:
+            if os.path.getmtime(path) > time():
+                with open(path, 'rb') as response:
+                    return response.read()
+        except (IOError, OSError):
+            pass
+
+        return None
+
+    def _net_cache_put(self, path, payload, cache_secs):
+        """
+        Stores the payload at the given response cache path. The file's
+        modification time is set to when the response should expire, so
+        the session exit sweep can tell expired files apart without
+        knowing which call site wrote them. The payload is written to a
+        temporary file next to the path and then renamed into place, so
+        that a reader never sees a partially-written response.
+        """
+
+        from tempfile import mkstemp
+        from time import time
+
+        partial_path = None
+        try:
+            handle, partial_path = mkstemp(dir=self._responses_dir,
+                                           suffix='.part')
+            with os.fdopen(handle, 'wb') as response:
+                response.write(payload)
+            expiry = time() + cache_secs
+            os.utime(partial_path, (expiry, expiry))
+            try:
+                os.rename(partial_path, path)
+            except OSError:  # e.g. Windows, which will not replace a file
+                os.remove(path)
+                os.rename(partial_path, path)
+        except (IOError, OSError) as error:
+            self._logger.warn("Unable to cache response at %s: %s",
+                              path, error)
+            if partial_path:
+                self.path_unlink(partial_path)
+
+    def _net_headers(self, awesome_ua=False, custom_headers=None):
+        """Returns the dict of headers to send with a web request."""
+
+        headers = {'User-Agent': (self.ecosystem.agent if awesome_ua
+                                  else DEFAULT_UA)}
+        if custom_headers:
+            headers.update(custom_headers)
+        return headers
+
+    @staticmethod
+    def _net_desc(number, total):
+        """Returns a description of the web request for messages."""
+
+        return ("web request" if total == 1
+                else "web request (%d of %d)" % (number, total))
+
+    @staticmethod
+    def _net_status_error(desc, code, payload=None):
+        """Returns a ValueError for an unexpected HTTP status code."""
+
+        value_error = ValueError("Got %d status for %s" % (code, desc))
+        if payload is not None:
+            value_error.payload = payload
+        return value_error
+
+    @staticmethod
+    def _net_check_mime(desc, require, mime):
+        """Raises a ValueError if the Content-Type is not as required."""
+
+        if 'mime' in require and \
+                require['mime'] != format(mime).replace('/x-', '/'):
+            value_error = ValueError(
+                "Request got %s Content-Type for %s; wanted %s" %
+                (mime, desc, require['mime'])
+            )
+            value_error.got_mime = mime
+            value_error.wanted_mime = require['mime']
+            raise value_error
+
+    def _net_check_size(self, desc, require, payload):
+        """Raises a TinyDownloadError if the payload is too small."""
+
+        if 'size' in require and len(payload) < require['size']:
+            raise self.TinyDownloadError(
+                "Request got %d-byte stream for %s; wanted %d+ bytes" %
+                (len(payload), desc, require['size'])
+            )
+
     def net_download(self, path, *args, **kwargs):
         """
         Downloads a file to the given path from the specified target(s).
@@ -625,6 +1131,28 @@ class Service(object):
         with open(path, 'wb') as response_output:
             response_output.write(payload)
 
+    def net_download_async(self, path, targets, callbacks, **kwargs):
+        """
+        Like net_download(), but returns immediately, calling
+        callbacks['okay'] without arguments once the file is written.
+        See net_stream_async() for information about available options.
+        """
+
+        def on_okay(payload):
+            """Write out the payload to the path."""
+
+            try:
+                with open(path, 'wb') as response_output:
+                    response_output.write(payload)
+            except Exception as exception:  # all, pylint:disable=W0703
+                callbacks['fail'](exception)
+            else:
+                callbacks['okay']()
+
+        self.net_stream_async(targets,
+                              dict(okay=on_okay, fail=callbacks['fail']),
+                              **kwargs)
+
     def net_dump(self, output_path, url):
         """
         Use `mplayer` to retrieve an audio stream and dump it to a raw
@@ -680,22 +1208,21 @@ class Service(object):
         """
         Returns a path using the given extension that may be used for
         writing out a temporary file.
+
+        If the file is not removed with path_unlink(), it will be once
+        the router calls path_release() at the end of the run.
         """
 
-        from string import ascii_lowercase, digits
-        alphanumerics = ascii_lowercase + digits
+        return self._scratch.path(extension)
 
-        from os.path import join
-        from random import choice
-        from time import time
-        return join(
-            self._temp_dir,
-            '%x-%s.%s' % (
-                int(time()),
-                ''.join(choice(alphanumerics) for i in range(30)),
-                extension,
-            ),
-        )
+    def path_release(self):
+        """
+        Removes any temporary files handed out by path_temp() to the
+        current thread that are still lying around. Intended for use by
+        the router after a run.
+        """
+
+        self._scratch.release()
 
     def path_unlink(self, *args):
         """
@@ -774,15 +1301,16 @@ class Service(object):
 
     def util_merge(self, input_files, output_file):
         """
-        Given several input files, dumbly merge together into a single
-        output file.
+        Given several input MP3 files, joins their audio frames together
+        into a single output MP3 file, leaving out the per-file ID3 tags
+        and Xing/Info headers that would otherwise end up mid-stream.
         """
 
+        from ..audio import join_mp3s
+
         self._logger.debug("Merging %s into %s", input_files, output_file)
         with open(output_file, 'wb') as output_stream:
-            for input_file in input_files:
-                with open(input_file, 'rb') as input_stream:
-                    output_stream.write(input_stream.read())
+            join_mp3s(input_files, output_stream)
 
     def util_pad(self, path):
         """
@@ -127,6 +127,7 @@ class Collins(Service):
         payload = self.net_stream(
             (SEARCH_FORM, dict(q=text, dictCode=LANG_TO_DICTCODE[voice])),
             method='GET',
+            cache_secs=self.CACHE_SECS_STABLE,
         )
 
         for regexp in LANG_TO_REGEXPS[voice]:
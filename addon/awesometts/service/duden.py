@@ -158,7 +158,8 @@ class Duden(Service):
         self._logger.debug('Duden: Searching on "%s"', text_search)
         try:
             search_html = self.net_stream((SEARCH_FORM, dict(s=text_search)),
-                                          require=dict(mime='text/html'))
+                                          require=dict(mime='text/html'),
+                                          cache_secs=self.CACHE_SECS_STABLE)
         except IOError as io_error:
             if getattr(io_error, 'code', None) == 404:
                 raise IOError("Duden does not recognize this input.")
@@ -211,7 +212,8 @@ class Duden(Service):
                                    'match; skipping', article_url)
                 continue
 
-            article_html = self.net_stream(article_url)
+            article_html = self.net_stream(article_url,
+                                           cache_secs=self.CACHE_SECS_STABLE)
 
             for mp3_match in RE_MP3.finditer(article_html):
                 guide = mp3_match.group(3)
@@ -321,41 +321,52 @@ class ESpeak(Service):
 
     def run(self, text, options, path):
         """
-        Checks for unicode workaround on Windows, writes a temporary
-        wave file, and then transcodes to MP3.
+        Checks for unicode workaround on Windows, then pipes the wave
+        stream from eSpeak's stdout into the transcoder.
+
+        On Windows, a temporary wave file is written and transcoded
+        instead, as eSpeak's stdout is not binary-safe there.
         """
 
         input_file = self.path_workaround(text)
-        output_wav = self.path_temp('wav')
+        output_wav = None
 
         voice = ('+'.join([options['voice'], options['variant']])
                  if options['variant'] and options['variant'] != "normal"
                  else options['voice'])
 
+        args = [
+            self._binary,
+            '-v', voice,
+            '-s', options['speed'],
+            '-g', int(options['gap'] * 100.0),
+            '-p', options['pitch'],
+            '-a', options['volume'],
+        ]
+        text_args = ['-f', input_file] if input_file else ['--', text]
+
         try:
-            self.cli_call(
-                [
-                    self._binary,
-                    '-v', voice,
-                    '-s', options['speed'],
-                    '-g', int(options['gap'] * 100.0),
-                    '-p', options['pitch'],
-                    '-a', options['volume'],
-                    '-w', output_wav,
-                ] + (
-                    ['-f', input_file] if input_file
-                    else ['--', text]
+            if self.IS_WINDOWS:
+                output_wav = self.path_temp('wav')
+                self.cli_call(args, '-w', output_wav, text_args)
+                self.cli_transcode(
+                    output_wav,
+                    path,
+                    require=dict(
+                        size_in=4096,
+                    ),
+                    add_padding=True,
                 )
-            )
 
-            self.cli_transcode(
-                output_wav,
-                path,
-                require=dict(
-                    size_in=4096,
-                ),
-                add_padding=True,
-            )
+            else:
+                self.cli_transcode_pipe(
+                    [args, '--stdout', text_args],
+                    path,
+                    require=dict(
+                        size_in=4096,
+                    ),
+                    add_padding=True,
+                )
 
         finally:
             self.path_unlink(input_file, output_wav)
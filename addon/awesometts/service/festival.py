@@ -22,6 +22,14 @@
 Service implementation for Festival Speech Synthesis System
 """
 
+import atexit
+import os
+import socket
+import subprocess
+import tempfile
+from threading import Lock
+from time import sleep, time
+
 from .base import Service
 from .common import Trait
 
@@ -34,6 +42,7 @@ class Festival(Service):
     """
 
     __slots__ = [
+        '_server',        # long-lived `festival --server` shared by threads
         '_version',       # we get this while testing for the festival binary
         '_voice_list',    # list of installed voices as a list of tuples
     ]
@@ -62,7 +71,6 @@ class Festival(Service):
         self._version = self.cli_output('festival', '--version').pop(0)
         self.cli_call('text2wave', '--help')
 
-        import os
         base_dir = '/usr/share/festival/voices'
         self._voice_list = [
             (voice_dir, "%s (%s)" % (voice_dir, lang_dir))
@@ -76,6 +84,8 @@ class Festival(Service):
         if not self._voice_list:
             raise EnvironmentError("No usable voices found in %s" % base_dir)
 
+        self._server = _Server(self._logger)
+
     def desc(self):
         """
         Returns a version string with terse description and release
@@ -124,21 +134,25 @@ class Festival(Service):
 
     def run(self, text, options, path):
         """
-        Write a temporary input text file, calls `text2wave` to write a
-        temporary wave file, and then transcodes that to MP3.
+        Has the Festival server synthesize the text into a temporary
+        wave file, then transcodes that. If the server cannot be used,
+        falls back to running `text2wave` for just this clip.
         """
 
-        input_file = self.path_input(text)
+        try:
+            wave = self._server.synth(options['voice'], text,
+                                      options['volume'] / 100.0)
+        except EnvironmentError as error:
+            self._logger.warn("Festival server unavailable (%s); falling "
+                              "back to text2wave", error)
+            self._run_text2wave(text, options, path)
+            return
+
         output_wav = self.path_temp('wav')
 
         try:
-            self.cli_call(
-                'text2wave',
-                '-o', output_wav,
-                '-eval', '(voice_%s)' % options['voice'],
-                '-scale', options['volume'] / 100.0,
-                input_file,
-            )
+            with open(output_wav, 'wb') as output:
+                output.write(wave)
 
             self.cli_transcode(
                 output_wav,
@@ -149,4 +163,449 @@ class Festival(Service):
             )
 
         finally:
-            self.path_unlink(input_file, output_wav)
+            self.path_unlink(output_wav)
+
+    def run_batch(self, texts, options, paths):
+        """
+        Has the Festival server synthesize all of the texts in a single
+        command, then transcodes each of the waves it sends back. A clip
+        that fails to transcode is skipped.
+        """
+
+        waves = self._server.synth_many(options['voice'], texts,
+                                        options['volume'] / 100.0)
+
+        for wave, path in zip(waves, paths):
+            output_wav = self.path_temp('wav')
+
+            try:
+                with open(output_wav, 'wb') as output:
+                    output.write(wave)
+
+                self.cli_transcode(
+                    output_wav,
+                    path,
+                    require=dict(
+                        size_in=4096,
+                    ),
+                )
+
+            except (RuntimeError, ValueError) as error:
+                self._logger.warn("Skipping batched clip for %s: %s",
+                                  path, error)
+
+            finally:
+                self.path_unlink(output_wav)
+
+    def _run_text2wave(self, text, options, path):
+        """
+        Write a temporary input text file, then pipes the wave stream
+        from `text2wave` (which writes to stdout when not given `-o`)
+        into the transcoder.
+        """
+
+        input_file = self.path_input(text)
+
+        try:
+            self.cli_transcode_pipe(
+                [
+                    'text2wave',
+                    '-eval', '(voice_%s)' % options['voice'],
+                    '-scale', options['volume'] / 100.0,
+                    input_file,
+                ],
+                path,
+                require=dict(
+                    size_in=4096,
+                ),
+            )
+
+        finally:
+            self.path_unlink(input_file)
+
+
+class _Server(object):
+    """
+    Runs `festival --server` in the background, so that Festival and
+    its voices are loaded once rather than for every clip.
+
+    The server forks a child for each client connection, so callers on
+    different threads each get their own connection and can synthesize
+    concurrently. Connections are kept open afterward, pooled by voice,
+    which means a voice is only loaded again if a connection for it is
+    not already sitting idle.
+
+    The server is started lazily on first use, checked before each use,
+    and restarted if it has gone away.
+    """
+
+    __slots__ = [
+        '_idle',     # dict of voice name to list of idle connections
+        '_lock',     # guards _idle, _port, and _process across threads
+        '_logger',   # logger-like interface with debug(), info(), etc.
+        '_passwd',   # password that the running server requires of clients
+        '_port',     # TCP port that the running server is listening on
+        '_process',  # Popen object for the running server, if any
+    ]
+
+    HOST = '127.0.0.1'
+
+    # terminates WV and LP payloads; occurrences within are stuffed w/ X
+    KEY = 'ft_StUfF_key'
+
+    # cap on connections (each w/ a forked server process) kept idle
+    MAX_IDLE = 4
+
+    # how long to wait for a newly-started server to accept connections
+    START_SECS = 15
+
+    # how long a connection may go without hearing back from the server
+    TIMEOUT_SECS = 30
+
+    def __init__(self, logger):
+        """Initialize with a logger; the server starts on first use."""
+
+        self._idle = {}
+        self._lock = Lock()
+        self._logger = logger
+        self._passwd = None
+        self._port = None
+        self._process = None
+
+        atexit.register(self.stop)
+
+    def synth(self, voice, text, scale):
+        """
+        Returns a RIFF wave bytestring of the given text spoken in the
+        given voice, with its amplitude multiplied by scale.
+        """
+
+        return self.synth_many(voice, [text], scale)[0]
+
+    def synth_many(self, voice, texts, scale):
+        """
+        Returns a list of RIFF wave bytestrings, one for each of the
+        given texts, spoken in the given voice, with their amplitudes
+        multiplied by scale. The texts are all sent as one command, and
+        each utterance comes back as its own WV reply.
+
+        If a pooled connection turns out to have died, the request is
+        retried once on a fresh connection (restarting the server if
+        needed). Raises EnvironmentError if the server cannot be
+        reached or does not answer in time, or RuntimeError if Festival
+        reports an error.
+        """
+
+        command = '(begin%s)\n' % ''.join(
+            " (let ((utt (utt.synth (Utterance Text \"%s\"))))"
+            " (utt.wave.rescale utt %s)"
+            " (utt.send.wave.client utt))" % (
+                text.encode('utf-8').replace('\\', '\\\\')
+                .replace('"', '\\"'),
+                repr(float(scale)),
+            )
+            for text in texts
+        )
+
+        for attempt in range(2):
+            connection = self._acquire(voice)
+
+            try:
+                waves = connection.request(command)
+
+            except socket.timeout:
+                connection.close()
+                raise EnvironmentError("Festival server did not answer "
+                                       "within %d seconds" %
+                                       self.TIMEOUT_SECS)
+
+            except (EOFError, socket.error) as error:
+                connection.close()
+                if attempt:
+                    raise EnvironmentError("Lost connection to Festival "
+                                           "server: %s" % error)
+                self._logger.warn("Festival server connection failed (%s); "
+                                  "retrying", error)
+                continue
+
+            except:  # close on any error, pylint:disable=bare-except
+                connection.close()
+                raise
+
+            self._release(voice, connection)
+
+            if len(waves) != len(texts):
+                raise RuntimeError("Festival server returned %d waves for "
+                                   "%d texts" % (len(waves), len(texts)))
+            return waves
+
+    def stop(self):
+        """Closes idle connections and terminates the server."""
+
+        with self._lock:
+            self._stop()
+
+    def _acquire(self, voice):
+        """
+        Returns an idle connection for the voice, or else a new one w/
+        the voice selected, (re)starting the server first if need be.
+        """
+
+        with self._lock:
+            if not self._process or self._process.poll() is not None:
+                if self._process:
+                    self._logger.warn("Festival server exited with %s; "
+                                      "restarting it", self._process.poll())
+                self._stop()
+                self._start()
+
+            idle = self._idle.get(voice)
+            if idle:
+                return idle.pop()
+
+            passwd = self._passwd
+            port = self._port
+
+        try:
+            connection = _Connection(self.HOST, port, self.KEY, passwd,
+                                     self.TIMEOUT_SECS)
+        except socket.error as error:
+            raise EnvironmentError("Cannot connect to Festival server: %s" %
+                                   error)
+
+        try:
+            connection.request("(begin (voice_%s) "
+                               "(Parameter.set 'Wavefiletype 'riff))\n" %
+                               voice)
+        except (EOFError, socket.error) as error:
+            connection.close()
+            raise EnvironmentError("Cannot select %s on Festival server: %s"
+                                   % (voice, error))
+        except:  # close on any error, pylint:disable=bare-except
+            connection.close()
+            raise
+
+        return connection
+
+    def _release(self, voice, connection):
+        """Returns the connection to the pool, or closes it if full."""
+
+        with self._lock:
+            if sum(len(idle) for idle in self._idle.values()) < self.MAX_IDLE:
+                self._idle.setdefault(voice, []).append(connection)
+                return
+
+        connection.close()
+
+    def _start(self):
+        """
+        Starts the server on a free port and waits for it to accept
+        connections. Must be called with the lock held.
+
+        The server only accepts clients on localhost that send it the
+        random password made up for this run. As anyone connected can
+        have Festival evaluate any Scheme (e.g. via `system`), these
+        settings go in a file only readable by this user, rather than
+        on the command line where other users could see them.
+        """
+
+        probe = socket.socket()
+        try:
+            probe.bind((self.HOST, 0))
+            port = probe.getsockname()[1]
+        finally:
+            probe.close()
+
+        passwd = os.urandom(16).encode('hex')
+
+        self._logger.debug("Starting Festival server on port %d", port)
+
+        handle, settings = tempfile.mkstemp(prefix='festival_', suffix='.scm')
+        try:
+            with os.fdopen(handle, 'w') as output:
+                output.write("(set! server_port %d)\n"
+                             "(set! server_passwd \"%s\")\n"
+                             "(set! server_access_list '(\"localhost\"))\n"
+                             % (port, passwd))
+
+            with open(os.devnull, 'r+') as devnull:
+                process = subprocess.Popen(
+                    ['festival', settings, '--server'],
+                    stdin=devnull, stdout=devnull, stderr=devnull,
+                    close_fds=True,
+                )
+
+            deadline = time() + self.START_SECS
+
+            while True:
+                if process.poll() is not None:
+                    raise EnvironmentError("Festival server exited with %d "
+                                           "while starting" %
+                                           process.returncode)
+
+                try:
+                    socket.create_connection((self.HOST, port), 1).close()
+                    break
+                except socket.error:
+                    if time() > deadline:
+                        process.terminate()
+                        raise EnvironmentError("Festival server did not "
+                                               "start listening within %d "
+                                               "seconds" % self.START_SECS)
+                    sleep(0.1)
+
+        finally:
+            try:
+                os.unlink(settings)
+            except OSError:
+                pass
+
+        self._passwd = passwd
+        self._port = port
+        self._process = process
+
+    def _stop(self):
+        """
+        Closes idle connections and terminates the server, if running.
+        Must be called with the lock held.
+        """
+
+        for idle in self._idle.values():
+            for connection in idle:
+                connection.close()
+        self._idle = {}
+
+        if self._process and self._process.poll() is None:
+            try:
+                self._process.terminate()
+                self._process.wait()
+            except OSError:
+                pass
+
+        self._passwd = None
+        self._port = None
+        self._process = None
+
+
+class _Connection(object):
+    """
+    Client connection to a Festival server, speaking its protocol: each
+    command (a single s-expression) is answered by any number of WV
+    (wave) or LP (Lisp) replies carrying a payload, then by OK (done)
+    or ER (failed).
+    """
+
+    __slots__ = [
+        '_buffer',  # bytes received from the socket but not yet consumed
+        '_key',     # terminator for WV and LP payloads
+        '_sock',    # socket connected to the server
+    ]
+
+    RECV_SIZE = 65536
+
+    def __init__(self, host, port, key, passwd, timeout):
+        """
+        Connects to the server at the given host and port, sending the
+        password that it expects before any commands. Any later send or
+        receive that takes longer than timeout raises socket.timeout.
+        """
+
+        self._buffer = ''
+        self._key = key
+        self._sock = socket.create_connection((host, port), timeout)
+
+        try:
+            self._sock.sendall(passwd + '\n')
+        except socket.error:
+            self.close()
+            raise
+
+    def close(self):
+        """Closes the connection, ignoring any failures."""
+
+        try:
+            self._sock.close()
+        except socket.error:
+            pass
+
+    def request(self, command):
+        """
+        Sends the command, then returns the list of WV payloads received
+        before the OK. Raises RuntimeError on ER, or EOFError if the
+        server hangs up.
+        """
+
+        self._sock.sendall(command)
+        waves = []
+
+        while True:
+            ack = self._read(3)
+
+            if ack == 'OK\n':
+                return waves
+            elif ack == 'ER\n':
+                raise RuntimeError("Festival server could not process the "
+                                   "command")
+            elif ack == 'WV\n':
+                waves.append(self._read_stuffed())
+            elif ack == 'LP\n':
+                self._read_stuffed()
+            else:
+                raise EOFError("Unexpected reply %r from Festival server" %
+                               ack)
+
+    def _fill(self):
+        """Receives more bytes onto the buffer, or raises EOFError."""
+
+        data = self._sock.recv(self.RECV_SIZE)
+        if not data:
+            raise EOFError("Festival server closed the connection")
+        self._buffer += data
+
+    def _read(self, size):
+        """Returns exactly the given number of bytes."""
+
+        while len(self._buffer) < size:
+            self._fill()
+
+        result = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return result
+
+    def _read_stuffed(self):
+        """
+        Returns a payload up to the key, undoing the server's stuffing,
+        where any occurrence of the key within the payload is sent with
+        an X inserted before the key's last character.
+        """
+
+        stem = self._key[:-1]
+        parts = []
+
+        while True:
+            index = self._buffer.find(stem)
+
+            if index == -1:
+                keep = len(stem) - 1
+                if len(self._buffer) > keep:
+                    parts.append(self._buffer[:-keep])
+                    self._buffer = self._buffer[-keep:]
+                self._fill()
+                continue
+
+            end = index + len(stem)
+            if len(self._buffer) <= end:
+                self._fill()
+                continue
+
+            follower = self._buffer[end]
+            if follower == self._key[-1]:
+                parts.append(self._buffer[:index])
+                self._buffer = self._buffer[end + 1:]
+                return ''.join(parts)
+            elif follower == 'X':
+                parts.append(self._buffer[:end])
+                self._buffer = self._buffer[end + 1:]
+            else:
+                parts.append(self._buffer[:end])
+                self._buffer = self._buffer[end:]
@@ -127,23 +127,28 @@ class Linguatec(Service):
         def fetch_piece(subtext, subpath):
             """Fetch given phrase from demo to given path."""
 
-            payload = self.net_stream(
-                (
-                    FORM_ENDPOINT,
-                    dict(
-                        text=subtext,
-                        voiceName=voice,
-                        speakSpeed=100,
-                        speakPith=100,  # sic
-                        speakVolume=100,
-                    ),
+            target = (
+                FORM_ENDPOINT,
+                dict(
+                    text=subtext,
+                    voiceName=voice,
+                    speakSpeed=100,
+                    speakPith=100,  # sic
+                    speakVolume=100,
                 ),
             )
-            match = RE_MP3.search(payload)
-            if not match:
-                raise SocketError("No MP3 was returned for the input.")
-            url = match.group(0)
-            self.net_download(subpath, url, require=REQUIRE_MP3)
+            payload = self.net_stream(target,
+                                      cache_secs=self.CACHE_SECS_EPHEMERAL)
+            try:
+                match = RE_MP3.search(payload)
+                if not match:
+                    raise SocketError("No MP3 was returned for the input.")
+                url = match.group(0)
+                self.net_download(subpath, url, require=REQUIRE_MP3)
+            except Exception:
+                # n.b. the MP3 URL on a cached page may have expired
+                self.net_uncache(target)
+                raise
 
         subtexts = self.util_split(text, 250)  # see `maxlength` on site
         if len(subtexts) == 1:
@@ -145,6 +145,7 @@ class Naver(Service):
             def process_subtext(output_mp3, subtext):
                 """Request a vcode and download the MP3."""
 
+                # n.b. not cached, as each vcode is only good for one use
                 vcode = self.net_stream(
                     (TRANSLATE_INIT, dict(text=subtext)),
                     method='POST',
@@ -121,9 +121,9 @@ class NeoSpeech(Service):
             def fetch_piece(subtext, subpath):
                 """Fetch given phrase from the API to the given path."""
 
-                payload = self.net_stream((DEMO_URL, dict(content=subtext,
-                                                          voiceId=voice_id)),
-                                          custom_headers=headers)
+                target = (DEMO_URL, dict(content=subtext, voiceId=voice_id))
+                payload = self.net_stream(target, custom_headers=headers,
+                                          cache_secs=self.CACHE_SECS_EPHEMERAL)
 
                 try:
                     data = json.loads(payload)
@@ -140,9 +140,14 @@ class NeoSpeech(Service):
                     url[0] == '/' and url[1].isalnum(), \
                     "The audio URL from NeoSpeech does not seem to be valid"
 
-                mp3_stream = self.net_stream(BASE_URL + url,
-                                             require=REQUIRE_MP3,
-                                             custom_headers=headers)
+                try:
+                    mp3_stream = self.net_stream(BASE_URL + url,
+                                                 require=REQUIRE_MP3,
+                                                 custom_headers=headers)
+                except Exception:
+                    # n.b. the audio URL on a cached page may have expired
+                    self.net_uncache(target, custom_headers=headers)
+                    raise
                 if self._last_phrase != subtext and \
                         self._last_stream == mp3_stream:
                     raise IOError("NeoSpeech seems to be returning the same "
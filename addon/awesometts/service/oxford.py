@@ -136,7 +136,8 @@ class Oxford(Service):
         )
 
         try:
-            html_payload = self.net_stream(dict_url)
+            html_payload = self.net_stream(dict_url,
+                                           cache_secs=self.CACHE_SECS_STABLE)
         except IOError as io_error:
             if getattr(io_error, 'code', None) == 404:
                 raise IOError(
@@ -185,28 +185,23 @@ class RHVoice(Service):
     def run(self, text, options, path):
         """
         Saves the incoming text into a file, and pipes it through
-        RHVoice-client and back out to a temporary wave file. If
-        successful, the temporary wave file will be transcoded to an MP3
-        for consumption by AwesomeTTS.
+        RHVoice-client, whose wave stream is piped straight on into the
+        transcoder to make an MP3 for consumption by AwesomeTTS.
         """
 
-        try:
-            input_txt = self.path_input(text)
-            output_wav = self.path_temp('wav')
+        input_txt = self.path_input(text)
 
-            self.cli_pipe(
+        try:
+            self.cli_transcode_pipe(
                 ['RHVoice-client',
                  '-s', options['voice'],
                  '-r', decimalize(options['speed']),
                  '-p', decimalize(options['pitch']),
                  '-v', decimalize(options['volume'])],
+                path,
+                require=dict(size_in=4096),
                 input_path=input_txt,
-                output_path=output_wav,
             )
 
-            self.cli_transcode(output_wav,
-                               path,
-                               require=dict(size_in=4096))
-
         finally:
-            self.path_unlink(input_txt, output_wav)
+            self.path_unlink(input_txt)
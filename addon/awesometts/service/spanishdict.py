@@ -28,6 +28,9 @@ from .common import Trait
 __all__ = ['SpanishDict']
 
 
+REQUIRE_MP3 = dict(mime='audio/mpeg', size=1024)
+
+
 class SpanishDict(Service):
     """
     Provides a Service-compliant implementation for SpanishDict.
@@ -78,16 +81,26 @@ class SpanishDict(Service):
         Downloads from SpanishDict directly to an MP3.
         """
 
-        self.net_download(
-            path,
-            [
-                ('http://audio.spanishdict.com/audio', dict(
-                    lang=options['voice'],
-                    text=subtext,
-                ))
-
-                for subtext in self.util_split(text, 200)
-            ],
-            add_padding=True,
-            require=dict(mime='audio/mpeg', size=1024),
-        )
+        self.net_download(path, self._targets(text, options),
+                          add_padding=True, require=REQUIRE_MP3)
+
+    def run_async(self, text, options, path, callbacks):
+        """
+        Downloads from SpanishDict directly to an MP3 on the event loop.
+        """
+
+        self.net_download_async(path, self._targets(text, options),
+                                callbacks, add_padding=True,
+                                require=REQUIRE_MP3)
+
+    def _targets(self, text, options):
+        """Returns the list of targets to download the text from."""
+
+        return [
+            ('http://audio.spanishdict.com/audio', dict(
+                lang=options['voice'],
+                text=subtext,
+            ))
+
+            for subtext in self.util_split(text, 200)
+        ]
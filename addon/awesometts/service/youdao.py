@@ -34,6 +34,8 @@ VOICE_CODES = [
 
 VOICE_LOOKUP = dict(VOICE_CODES)
 
+REQUIRE_MP3 = dict(mime='audio/mpeg', size=256)
+
 
 class Youdao(Service):
     """Provides a Service implementation for Youdao Dictionary."""
@@ -84,15 +86,23 @@ class Youdao(Service):
     def run(self, text, options, path):
         """Downloads from dict.youdao.com directly to an MP3."""
 
-        self.net_download(
-            path,
-            [
-                ('http://dict.youdao.com/dictvoice', dict(
-                    audio=subtext,
-                    type=VOICE_LOOKUP[options['voice']][1],
-                ))
-                for subtext in self.util_split(text, 1000)
-            ],
-            require=dict(mime='audio/mpeg', size=256),
-            add_padding=True,
-        )
+        self.net_download(path, self._targets(text, options),
+                          require=REQUIRE_MP3, add_padding=True)
+
+    def run_async(self, text, options, path, callbacks):
+        """Downloads from dict.youdao.com to an MP3 on the event loop."""
+
+        self.net_download_async(path, self._targets(text, options),
+                                callbacks, require=REQUIRE_MP3,
+                                add_padding=True)
+
+    def _targets(self, text, options):
+        """Returns the list of targets to download the text from."""
+
+        return [
+            ('http://dict.youdao.com/dictvoice', dict(
+                audio=subtext,
+                type=VOICE_LOOKUP[options['voice']][1],
+            ))
+            for subtext in self.util_split(text, 1000)
+        ]
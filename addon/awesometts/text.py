@@ -22,16 +22,19 @@
 Basic manipulation and sanitization of input text
 """
 
+from collections import OrderedDict
 import re
-from StringIO import StringIO
+from timeit import default_timer
 
-from BeautifulSoup import BeautifulSoup
 import anki
 
+from .bundle import Bundle
+
 __all__ = ['RE_CLOZE_BRACED', 'RE_CLOZE_RENDERED', 'RE_ELLIPSES',
            'RE_ELLIPSES_LEADING', 'RE_ELLIPSES_TRAILING', 'RE_FILENAMES',
-           'RE_HINT_LINK', 'RE_LINEBREAK_HTML', 'RE_NEWLINEISH', 'RE_SOUNDS',
-           'RE_WHITESPACE', 'STRIP_HTML', 'Sanitizer']
+           'RE_HINT_LINK', 'RE_HTML_ATTR', 'RE_HTML_TAG', 'RE_LINEBREAK_HTML',
+           'RE_NEWLINEISH', 'RE_SOUNDS', 'RE_UNFUSABLE', 'RE_WHITESPACE',
+           'STRIP_HTML', 'Sanitizer']
 
 
 RE_CLOZE_BRACED = re.compile(anki.template.template.clozeReg % r'\d+')
@@ -47,45 +50,267 @@ RE_ELLIPSES_TRAILING = re.compile(r'\s*(\.\s*){3,}$')
 RE_FILENAMES = re.compile(r'([a-z\d]+(-[a-f\d]{8}){5}|ATTS .+)'
                           r'( \(\d+\))?\.mp3')
 RE_HINT_LINK = re.compile(r'<a[^>]+class=.?hint.?[^>]*>[^<]+</a>')
+RE_HTML_ATTR = re.compile(r'([^\s=/>]+)'
+                          r'(?:\s*=\s*("[^"]*"|\'[^\']*\'|[^\s>]*))?')
+RE_HTML_TAG = re.compile(  # n.b. comments match too, but w/o a tag name
+    r'<!--.*?-->|'
+    r'<(/?)([a-zA-Z][^\s/>]*)((?:[^>"\']|"[^"]*"|\'[^\']*\')*)>',
+    re.DOTALL,
+)
 RE_LINEBREAK_HTML = re.compile(r'<\s*/?\s*(br|div|p)(\s+[^>]*)?\s*/?\s*>',
                                re.IGNORECASE)
 RE_NEWLINEISH = re.compile(r'(\r|\n|<\s*/?\s*(br|div|p)(\s+[^>]*)?\s*/?\s*>)+',
                            re.IGNORECASE)
 RE_SOUNDS = re.compile(r'\[sound:(.*?)\]')  # see also anki.sound._soundReg
+RE_UNFUSABLE = re.compile(r'[\0\s.]', re.UNICODE)
 RE_WHITESPACE = re.compile(r'[\0\s]+', re.UNICODE)
 
 STRIP_HTML = anki.utils.stripHTML  # this also converts character entities
 
+_FUSE_MAX = 90  # most rules per alternation, within the regex group limit
+
 
 class Sanitizer(object):  # call only, pylint:disable=too-few-public-methods
-    """Once instantiated, provides a callable to sanitize text."""
+    """
+    Once instantiated, provides a callable to sanitize text.
+
+    The rules are compiled on first use into a pipeline of the rule
+    methods to be run, with any config values they depend on already
+    looked up, and rules switched off by the config dropped entirely.
+    The pipeline is compiled again only after one of those config
+    values changes.
+
+    Results are memoized in a bounded LRU keyed on the input text, so
+    sanitizing unchanged content again (e.g. replaying the same card)
+    is nearly free. The memo is emptied whenever the pipeline is, and
+    a generation number keeps a call that was already underway during
+    a config change from memoizing a stale result.
+    """
 
     # _rule_xxx() methods are in-class for getattr, pylint:disable=no-self-use
 
     __slots__ = [
-        '_config',  # dict-like interface for looking up config conditionals
-        '_logger',  # logger-like interface for debugging the Sanitizer
-        '_rules',   # list of rules that this instance's callable will process
+        '_config',      # dict-like interface for config conditionals
+        '_generation',  # bumped whenever the pipeline and memo are dropped
+        '_hits',        # number of calls answered from the memo
+        '_logger',      # logger-like interface for debugging the Sanitizer
+        '_memo',        # OrderedDict of input text to result, oldest first
+        '_misses',      # number of calls that had to run the pipeline
+        '_pipeline',    # list of (name, label, method, args) from rules
+        '_rules',       # list of rules that this instance's callable processes
+        '_timings',     # dict of rule name to [calls, secs], None if off
     ]
 
+    # most results kept in the memo of each instance
+    MEMO_SIZE = 512
+
     def __init__(self, rules, config=None, logger=None):
         self._rules = rules
         self._config = config
         self._logger = logger
+        self._generation = 0
+        self._hits = 0
+        self._memo = OrderedDict()
+        self._misses = 0
+        self._pipeline = None
+        self._timings = None
+
+        if config:
+            keys = set()
+            for rule in rules:
+                if isinstance(rule, tuple):
+                    keys.update(rule[1] if isinstance(rule[1], list)
+                                else [rule[1]])
+                    keys.update(rule[2:])
+            if keys:
+                config.bind(sorted(keys), self._on_config)
 
     def __call__(self, text):
         """Apply the initialized rules against the text and return."""
 
+        memo = self._memo
+
+        try:
+            result = memo.pop(text)
+        except KeyError:
+            pass
+        else:
+            memo[text] = result  # n.b. reinserting marks most recently used
+            self._hits += 1
+            self._log(["memo"], result)
+            return result
+
+        self._misses += 1
+        generation = self._generation
+        result = self._run(text)
+
+        if generation == self._generation:
+            memo[text] = result
+            if len(memo) > self.MEMO_SIZE:
+                memo.popitem(last=False)
+
+        return result
+
+    def batch(self, texts):
+        """
+        Sanitizes a list of texts, returning the results in the same
+        order. Identical inputs are only sanitized once, memoized ones
+        are not sanitized again, and the remaining inputs are run
+        through the pipeline together, one rule at a time.
+
+        Results are not added to the memo, as a large batch would only
+        push out everything else in it.
+        """
+
+        memo = self._memo
+        results = {}
+        pending = []
+
+        for text in texts:
+            if text in results:
+                continue
+            try:
+                results[text] = memo[text]
+                self._hits += 1
+            except KeyError:
+                results[text] = None
+                pending.append(text)
+
+        self._misses += len(pending)
+
+        if pending:
+            pipeline = self._pipeline
+            if pipeline is None:
+                pipeline = self._pipeline = self._compile()
+
+            current = pending
+            timings = self._timings
+            for name, _, method, args in pipeline:
+                if timings is None:
+                    current = [text and method(text, *args)
+                               for text in current]
+                    continue
+
+                began = default_timer()
+                current = [text and method(text, *args) for text in current]
+                self._time(name, len(current), default_timer() - began)
+
+            for text, result in zip(pending, current):
+                results[text] = result or ''
+
+        if self._logger:
+            self._logger.debug("Transformed batch of %d (%d distinct, %d "
+                               "memoized) using %s", len(texts), len(results),
+                               len(results) - len(pending),
+                               [entry[1] for entry in self._pipeline or []])
+
+        return [results[text] for text in texts]
+
+    def stats(self):
+        """
+        Returns a bundle with the number of calls answered from the
+        memo (hits) or not (misses), and the memo's size and capacity.
+        """
+
+        return Bundle(hits=self._hits, misses=self._misses,
+                      size=len(self._memo), capacity=self.MEMO_SIZE)
+
+    def profile(self, enabled=True):
+        """
+        Switches per-rule timing on or off. Switching it on (again)
+        starts over with empty counters.
+        """
+
+        self._timings = {} if enabled else None
+
+    def timings(self):
+        """
+        Returns a list of bundles, slowest first, with the name of each
+        rule that has run since profiling was switched on, the number
+        of texts it was called with (calls), and its total time (secs).
+        """
+
+        return sorted(
+            (Bundle(rule=name, calls=calls, secs=secs)
+             for name, (calls, secs) in (self._timings or {}).items()),
+            key=lambda timing: timing.secs,
+            reverse=True,
+        )
+
+    def report(self, title='Sanitizer'):
+        """
+        Returns a multi-line string summarizing the memo and, if
+        profiling is on, the per-rule timings.
+        """
+
+        stats = self.stats()
+        lines = ["%s: %d hits, %d misses, memo %d/%d" %
+                 (title, stats.hits, stats.misses, stats.size, stats.capacity)]
+
+        if self._timings is None:
+            lines.append("  (profiling is off)")
+        else:
+            for timing in self.timings():
+                lines.append("  %-32s %8d calls %10.4fs %8.1fus/call" % (
+                    timing.rule, timing.calls, timing.secs,
+                    timing.secs / timing.calls * 1e6 if timing.calls else 0,
+                ))
+
+        return '\n'.join(lines)
+
+    def _run(self, text):
+        """Runs the text through the compiled pipeline and returns."""
+
+        pipeline = self._pipeline
+        if pipeline is None:
+            pipeline = self._pipeline = self._compile()
+
         applied = []
+        timings = self._timings
 
-        for rule in self._rules:
+        for name, label, method, args in pipeline:
             if not text:
                 self._log(applied + ["early exit"], '')
                 return ''
 
+            applied.append(label)
+
+            if timings is None:
+                text = method(text, *args)
+            else:
+                began = default_timer()
+                text = method(text, *args)
+                self._time(name, 1, default_timer() - began)
+
+        self._log(applied, text)
+        return text
+
+    def _time(self, name, calls, secs):
+        """Adds to the counters for the named rule, if profiling."""
+
+        try:
+            timing = self._timings[name]
+        except KeyError:
+            self._timings[name] = [calls, secs]
+        except TypeError:  # profiling was switched off meanwhile
+            pass
+        else:
+            timing[0] += calls
+            timing[1] += secs
+
+    def _compile(self):
+        """
+        Returns a list of (name, label, method, args) tuples for the
+        rules that the current config has switched on, where the method
+        is to be called with the text and args. The name is what timings
+        are kept under, and the label is what gets logged for the rule.
+        """
+
+        pipeline = []
+
+        for rule in self._rules:
             if isinstance(rule, basestring):  # always run these rules
-                applied.append(rule)
-                text = getattr(self, '_rule_' + rule)(text)
+                args = ()
 
             elif isinstance(rule, tuple):  # rule that depends on config
                 try:
@@ -101,32 +326,53 @@ class Sanitizer(object):  # call only, pylint:disable=too-few-public-methods
                               False) if isinstance(key, list)
                          else self._config[key])
 
-                if value is True:  # basic on/off config flag
-                    if addl:
-                        addl = self._config[addl]
-                        applied.append((rule, addl))
-                        text = getattr(self, '_rule_' + rule)(text, addl)
-
-                    else:
-                        applied.append(rule)
-                        text = getattr(self, '_rule_' + rule)(text)
+                if not value:
+                    continue
 
-                elif value:  # some other truthy value that drives the rule
-                    if addl:
-                        addl = self._config[addl]
-                        applied.append((rule, value, addl))
-                        text = getattr(self, '_rule_' + rule)(text, value,
-                                                              addl)
-
-                    else:
-                        applied.append((rule, value))
-                        text = getattr(self, '_rule_' + rule)(text, value)
+                # a basic on/off config flag is not passed to the rule, but
+                # some other truthy value that drives the rule is
+                args = () if value is True else (value,)
+                if addl:
+                    args += (self._config[addl],)
 
             else:
                 raise AssertionError("bad rule given to Sanitizer instance")
 
-        self._log(applied, text)
-        return text
+            method = getattr(self, '_rule_' + rule)
+
+            # consecutive within_xxx rules are fused into one pass
+            if hasattr(method, 'pair'):
+                if pipeline and pipeline[-1][2] == self._rule_within:
+                    _, label, _, (_, pairs) = pipeline.pop()
+                    label += (rule,)
+                    pairs += (method.pair,)
+                else:
+                    label = (rule,)
+                    pairs = (method.pair,)
+
+                pipeline.append(('+'.join(label), label, self._rule_within,
+                                 self._prepare_within(*pairs)))
+                continue
+
+            prepare = getattr(self, '_prepare_' + rule, None)
+            pipeline.append((
+                rule,
+                (rule,) + args if args else rule,
+                method,
+                prepare(*args) if prepare else args,
+            ))
+
+        return pipeline
+
+    def _on_config(self, config):  # pylint:disable=unused-argument
+        """
+        Drops the compiled pipeline and the memo so the next call
+        rebuilds them.
+        """
+
+        self._generation += 1
+        self._pipeline = None
+        self._memo.clear()
 
     def _log(self, method, result):
         """If we have a logger, send debug line for transformation."""
@@ -207,27 +453,54 @@ class Sanitizer(object):  # call only, pylint:disable=too-few-public-methods
         """
         Given text that has a revealed cloze span, return only the
         contents of that span.
+
+        This is a single pass over the tags, keeping a stack of open
+        spans; an unclosed span runs to the end of the text, and the
+        contents of nested cloze spans are returned in their own right
+        as well as within their parent's.
         """
 
-        revealed_tags = BeautifulSoup(text)('span', attrs={'class': 'cloze'})
+        opened = []  # (tag offset, contents offset) or None per open span
+        revealed = []  # (tag offset, contents) for each cloze span
+
+        for match in RE_HTML_TAG.finditer(text):
+            name = match.group(2)
+            if not name or name.lower() != 'span':
+                continue
+
+            if match.group(1):
+                if opened:
+                    span = opened.pop()
+                    if span:
+                        revealed.append((span[0],
+                                         text[span[1]:match.start()]))
+
+            elif not match.group(3).endswith('/'):
+                opened.append((match.start(), match.end())
+                              if _aux_class_is(match.group(3), 'cloze')
+                              else None)
+
+        revealed.extend((span[0], text[span[1]:])
+                        for span in opened if span)
 
         return ' ... '.join(
-            ''.join(
-                unicode(content)
-                for content in tag.contents
-            )
-            for tag in revealed_tags
-        ) if revealed_tags else text
+            contents
+            for offset, contents in sorted(revealed)
+        ) if revealed else text
 
-    def _rule_counter(self, text, characters, wrap):
+    def _prepare_counter(self, characters, wrap):
+        """Compiles the pattern for _rule_counter() ahead of time."""
+
+        return re.compile(r'[' + re.escape(characters) + ']{2,}'), wrap
+
+    def _rule_counter(self, text, pattern, wrap):
         """
-        Upon encountering the given characters, replace with the number
-        of those characters that were encountered.
+        Upon encountering a run of the characters in the given compiled
+        pattern, replace with the number of those characters that were
+        encountered.
         """
 
-        return re.sub(
-            r'[' + re.escape(characters) + ']{2,}',
-
+        return pattern.sub(
             self._rule_counter.wrapper if wrap
             else self._rule_counter.spacer,
 
@@ -239,21 +512,94 @@ class Sanitizer(object):  # call only, pylint:disable=too-few-public-methods
 
     _rule_counter.spacer = lambda match: (' ' + str(len(match.group(0))) + ' ')
 
-    def _rule_custom_sub(self, text, rules):
+    def _prepare_custom_sub(self, rules):
+        """
+        Compiles the user's rules into as few substitution passes as
+        possible, returning a list of (compiled, replace, size) passes,
+        where size is the number of rules that the pass stands in for.
+
+        Runs of plain (non-regex) rules with the same flags are merged
+        into a single alternation where doing so cannot change the
+        result, i.e. when, within the run:
+
+            - no input contains another, nor ends with the start of
+              an earlier one (so a later rule can never claim text
+              that an earlier rule would have matched),
+            - no replacement is empty nor overlaps any later input (so
+              no replacement can take part in a later match),
+            - no input or replacement has whitespace, periods, or nulls
+              (so the whitespace and ellipsis rules that normally run
+              before each rule have the same effect whether they run
+              between those rules or all before the merged pass).
+
+        Anything else, including regex rules, gets a pass of its own.
+        """
+
+        passes = []
+        run = []  # (rule, expanded replacement) for the current run
+
+        def flush():
+            """Closes out the current run as a pass."""
+
+            if len(run) == 1:
+                passes.append((run[0][0]['compiled'], run[0][0]['replace'],
+                               1))
+
+            elif run:
+                expansions = [expansion for _, expansion in run]
+                passes.append((
+                    re.compile('|'.join('(%s)' % rule['compiled'].pattern
+                                        for rule, _ in run),
+                               run[0][0]['compiled'].flags),
+                    lambda match: expansions[match.lastindex - 1],
+                    len(run),
+                ))
+
+            del run[:]
+
+        for rule in rules:
+            expansion = _aux_expansion(rule)
+
+            if expansion is None:
+                flush()
+                passes.append((rule['compiled'], rule['replace'], 1))
+                continue
+
+            if len(run) == _FUSE_MAX or not _aux_fusable(rule, run):
+                flush()
+            run.append((rule, expansion))
+
+        flush()
+        return (passes,)
+
+    def _rule_custom_sub(self, text, passes):
         """
         Upon encountering text that matches one of the user's compiled
         rules, make a replacement. Run whitespace and ellipsis rules
-        before each one.
+        before each rule (i.e. as many times as the pass has rules),
+        except where they are known to have nothing left to do (i.e.
+        they last made no change, and no pass has changed the text
+        since).
         """
 
-        for rule in rules:
-            text = self._rule_whitespace(self._rule_ellipses(text))
-            if not text:
-                return ''
+        stable = False
 
-            text = rule['compiled'].sub(rule['replace'], text)
-            if not text:
+        for compiled, replace, size in passes:
+            for _ in range(size):
+                if stable:
+                    break
+                tidied = self._rule_whitespace(self._rule_ellipses(text))
+                if not tidied:
+                    return ''
+                stable = tidied == text
+                text = tidied
+
+            replaced, count = compiled.subn(replace, text)
+            if not replaced:
                 return ''
+            if count and replaced != text:
+                stable = False
+                text = replaced
 
         return text
 
@@ -280,14 +626,54 @@ class Sanitizer(object):  # call only, pylint:disable=too-few-public-methods
     def _rule_hint_content(self, text):
         """
         Removes hint content from the use of a {{hint:xxx}} field.
-        """
 
-        soup = BeautifulSoup(text)
-        hints = soup.findAll('div', attrs={'class': 'hint'})
-        while hints:
-            hints.pop().extract()
+        This is a single pass over the tags, counting nested divs while
+        inside of a hint; an unclosed hint runs to the end of the text.
+        Like the tree-building parser this once used, closing div tags
+        without a matching opening tag are dropped as well.
+        """
 
-        return unicode(soup)
+        depth = 0  # of divs open within the current hint, if any
+        kept = []
+        opened = 0  # of divs open outside of any hint
+        position = 0  # where the text to be kept resumes
+
+        for match in RE_HTML_TAG.finditer(text):
+            name = match.group(2)
+            if not name or name.lower() != 'div':
+                continue
+
+            if depth:
+                if match.group(1):
+                    depth -= 1
+                    if not depth:
+                        position = match.end()
+                elif not match.group(3).endswith('/'):
+                    depth += 1
+
+            elif match.group(1):
+                if opened:
+                    opened -= 1
+                else:
+                    kept.append(text[position:match.start()])
+                    position = match.end()
+
+            elif _aux_class_is(match.group(3), 'hint'):
+                kept.append(text[position:match.start()])
+                if match.group(3).endswith('/'):
+                    position = match.end()
+                else:
+                    depth = 1
+
+            elif not match.group(3).endswith('/'):
+                opened += 1
+
+        if not kept:
+            return text
+
+        if not depth:
+            kept.append(text[position:])
+        return ''.join(kept)
 
     def _rule_hint_links(self, text):
         """
@@ -353,56 +739,187 @@ class Sanitizer(object):  # call only, pylint:disable=too-few-public-methods
 
         return RE_WHITESPACE.sub(' ', text).strip()
 
+    def _prepare_within(self, *pairs):
+        """Compiles a pattern matching any char in the given pairs."""
+
+        return (re.compile('[%s]' % re.escape(''.join(char
+                                                     for pair in pairs
+                                                     for char in pair))),
+                pairs)
+
+    def _rule_within(self, text, pattern, pairs):
+        """
+        Removes text within each of the given (opening, closing) pairs
+        of characters matched by pattern, in a single pass.
+        """
+
+        return _aux_within(text, pattern, pairs)
+
     def _rule_within_braces(self, text):
         """Removes text within curly braces."""
-        return _aux_within(text, '{', '}')
+        return self._rule_within(text, *self._prepare_within(('{', '}')))
+
+    _rule_within_braces.pair = ('{', '}')
 
     def _rule_within_brackets(self, text):
         """Removes text within square brackets."""
-        return _aux_within(text, '[', ']')
+        return self._rule_within(text, *self._prepare_within(('[', ']')))
+
+    _rule_within_brackets.pair = ('[', ']')
 
     def _rule_within_parens(self, text):
         """Removes text within parentheses."""
-        return _aux_within(text, '(', ')')
+        return self._rule_within(text, *self._prepare_within(('(', ')')))
+
+    _rule_within_parens.pair = ('(', ')')
+
+
+def _aux_expansion(rule):
+    """
+    Returns the replacement for the given substitution rule, expanded
+    as re.sub() would, if the rule could be merged into an alternation
+    at all (see Sanitizer._prepare_custom_sub()), or None otherwise.
+    """
+
+    if rule.get('regex'):
+        return None
+
+    # n.b. a case-insensitive input can match text that differs from it in
+    # case, so a replacement referring to the match (e.g. \g<0>) has to be
+    # expanded for each match, in a pass of its own
+    if rule['compiled'].flags & re.IGNORECASE and '\\' in rule['replace']:
+        return None
+
+    try:  # n.b. a plain input matches itself exactly once, in full
+        expansion = rule['compiled'].sub(rule['replace'], rule['input'])
+    except Exception:  # sre_constants.error, pylint:disable=broad-except
+        return None
+
+    if not expansion or RE_UNFUSABLE.search(rule['input']) or \
+            RE_UNFUSABLE.search(expansion):
+        return None
+
+    return expansion
+
 
+def _aux_fusable(rule, run):
+    """
+    Returns True if the given plain substitution rule may join the run
+    of (rule, expansion) tuples that precede it in a single alternation
+    (see Sanitizer._prepare_custom_sub()).
+    """
+
+    if not run:
+        return True
+
+    if rule['compiled'].flags != run[0][0]['compiled'].flags:
+        return False
 
-def _aux_within(text, begin_char, end_char):
+    fold = ((lambda string: string.lower())
+            if rule['compiled'].flags & re.IGNORECASE
+            else (lambda string: string))
+    needle = fold(rule['input'])
+
+    return not any(_aux_overlaps(needle, fold(other['input']),
+                                 either_end=False) or
+                   _aux_overlaps(needle, fold(other_expansion))
+                   for other, other_expansion in run)
+
+
+def _aux_overlaps(later, earlier, either_end=True):
     """
-    Removes any substring of text that starts with begin_char and
-    ends with end_char.
+    Returns True if either string contains the other, or if the end of
+    the later string is the same as the start of the earlier one. If
+    either_end is set, the reverse of the latter is checked as well.
     """
 
-    changed = False
-    result = StringIO()
-    sequences = []
+    if later in earlier or earlier in later:
+        return True
 
-    for char in text:
-        if char == begin_char:  # begins new level of text to possibly cut
-            sequence = StringIO()
-            sequence.write(char)
-            sequences.append(sequence)
+    for size in range(1, min(len(later), len(earlier))):
+        if later[-size:] == earlier[:size] or \
+                either_end and later[:size] == earlier[-size:]:
+            return True
 
-        elif char == end_char:
-            if sequences:  # match the last opening char and cut this text
-                changed = True
-                sequences.pop().close()
+    return False
 
-            else:  # include closing chars w/o matching opening in result
-                result.write(char)
 
-        elif sequences:  # write regular chars to current sequence level
-            sequences[-1].write(char)
+def _aux_class_is(attrs, value):
+    """
+    Returns True if the raw attributes from an HTML tag have a class
+    attribute that is exactly the given value.
+    """
+
+    for match in RE_HTML_ATTR.finditer(attrs):
+        if match.group(1).lower() == 'class':
+            return (match.group(2) or '').strip('"\'') == value
 
-        else:  # write top-level regular chars to the result
-            result.write(char)
+    return False
 
-    if changed:  # replace passed text object with the buffer
-        for sequence in sequences:  # include stuff lacking a closing char
-            result.write(sequence.getvalue())
-        text = result.getvalue()
 
-    result.close()
-    while sequences:
-        sequences.pop().close()
+def _aux_within(text, pattern, pairs):
+    """
+    Removes any substring of text that starts with an opening char and
+    ends with its closing char, for each (opening, closing) pair given,
+    where pattern matches any of those chars.
+
+    The result is the same as making a separate pass for each pair in
+    turn: a closing char without a matching opening char is kept, as
+    is an opening char that is never closed (along with what follows
+    it, less any matched pairs within), and a pair only counts if it
+    was not already removed as part of an earlier pair's substrings.
+
+    Rather than copying characters into a buffer per nesting level,
+    this finds the offsets of all the delimiters in one scan, matches
+    them up on a stack of indices, and then slices the text once.
+    """
+
+    delims = [(match.start(), match.group()) for match in
+              pattern.finditer(text)]
+    removed = []  # (start, end) offsets of substrings to cut
+
+    for begin_char, end_char in pairs:
+        matched = []
+        opened = []
+
+        for index, (_, char) in enumerate(delims):
+            if char == begin_char:
+                opened.append(index)
+            elif char == end_char and opened:
+                matched.append((opened.pop(), index))
+
+        if not matched:
+            continue
+
+        # only the outermost matched pairs matter; others are within them
+        outermost = []
+        for first, last in sorted(matched):
+            if not outermost or first > outermost[-1][1]:
+                outermost.append((first, last))
+
+        removed.extend((delims[first][0], delims[last][0] + 1)
+                       for first, last in outermost)
+
+        # delimiters inside of what was cut are no longer seen by later pairs
+        remaining = []
+        cut = iter(outermost)
+        first, last = next(cut)
+        for index, delim in enumerate(delims):
+            if index > last:
+                first, last = next(cut, (len(delims), len(delims)))
+            if not first <= index <= last:
+                remaining.append(delim)
+        delims = remaining
+
+    if not removed:
+        return text
+
+    kept = []
+    position = 0
+    for start, end in sorted(removed):
+        if start >= position:  # n.b. else within a previous pair's cut
+            kept.append(text[position:start])
+            position = end
+    kept.append(text[position:])
 
-    return text
+    return ''.join(kept)
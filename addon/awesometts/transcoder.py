@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+
+# AwesomeTTS text-to-speech add-on for Anki
+#
+# Copyright (C) 2016       Anki AwesomeTTS Development Team
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Shared transcoding stage for services that need LAME
+"""
+
+from Queue import Queue
+import sys
+from threading import Event, Lock, Thread
+from time import time
+
+from .bundle import Bundle
+
+__all__ = ['Transcoder']
+
+
+class Transcoder(object):
+    """
+    Runs transcoding jobs from all services on a fixed number of worker
+    threads, one per CPU core by default. Each job is a callable that
+    does its work in a separate process (i.e. LAME), so the workers do
+    not contend for the interpreter, and however many services happen
+    to be synthesizing at once, encoding keeps every core busy without
+    oversubscribing them.
+    """
+
+    __slots__ = [
+        '_lock',     # guards _stats and _threads across worker threads
+        '_logger',   # logger-like interface with debug(), info(), etc.
+        '_queue',    # Queue of job records waiting for a worker
+        '_size',     # number of worker threads to run
+        '_stats',    # dict of job counters and cumulative timings
+        '_threads',  # list of worker threads, started on first use
+    ]
+
+    def __init__(self, logger, size=None):
+        """
+        Initialize with a logger and the number of worker threads. If
+        no size is given, the number of CPU cores is used.
+        """
+
+        if not size:
+            try:
+                from multiprocessing import cpu_count
+                size = cpu_count()
+            except (ImportError, NotImplementedError):
+                size = 2
+
+        self._lock = Lock()
+        self._logger = logger
+        self._queue = Queue()
+        self._size = size
+        self._stats = dict(queued=0, active=0, completed=0, failed=0,
+                           wait_secs=0.0, work_secs=0.0)
+        self._threads = []
+
+    def run(self, job, desc):
+        """
+        Queues the job, blocks until a worker has run it, and returns
+        its result, re-raising its exception if it failed. The desc is
+        used for logging.
+
+        Because this blocks, it must not be called from the main thread.
+        """
+
+        record = dict(desc=desc, job=job, done=Event(), queued=time(),
+                      result=None, error=None)
+
+        with self._lock:
+            while len(self._threads) < self._size:
+                thread = Thread(target=self._work,
+                                name='transcoder-%d' % len(self._threads))
+                thread.daemon = True
+                thread.start()
+                self._threads.append(thread)
+
+            self._stats['queued'] += 1
+            depth = self._stats['queued']
+
+        self._logger.debug("Queued transcode of %s; queued=%d", desc, depth)
+        self._queue.put(record)
+        record['done'].wait()
+
+        if record['error']:
+            raise record['error'][0], record['error'][1], record['error'][2]
+        return record['result']
+
+    def stats(self):
+        """
+        Returns a bundle with the number of workers, jobs queued, jobs
+        active, jobs completed or failed so far, and the average number
+        of seconds that finished jobs spent queued and running.
+        """
+
+        with self._lock:
+            stats = dict(self._stats)
+
+        finished = stats['completed'] + stats['failed']
+        return Bundle(
+            workers=self._size,
+            queued=stats['queued'],
+            active=stats['active'],
+            completed=stats['completed'],
+            failed=stats['failed'],
+            avg_wait_secs=stats['wait_secs'] / finished if finished else 0.0,
+            avg_work_secs=stats['work_secs'] / finished if finished else 0.0,
+        )
+
+    def _work(self):
+        """Takes job records off of the queue and runs them, forever."""
+
+        while True:
+            record = self._queue.get()
+            started = time()
+
+            with self._lock:
+                self._stats['queued'] -= 1
+                self._stats['active'] += 1
+                self._stats['wait_secs'] += started - record['queued']
+
+            try:
+                record['result'] = record['job']()
+            except Exception:  # catch all, pylint:disable=W0703
+                record['error'] = sys.exc_info()
+
+            finished = time()
+
+            with self._lock:
+                self._stats['active'] -= 1
+                self._stats['failed' if record['error'] else 'completed'] += 1
+                self._stats['work_secs'] += finished - started
+                depth = self._stats['queued']
+
+            self._logger.debug("Transcoded %s in %.2fs after %.2fs queued; "
+                               "queued=%d", record['desc'], finished - started,
+                               started - record['queued'], depth)
+
+            record['done'].set()